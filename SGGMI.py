@@ -6,18 +6,31 @@ https://github.com/MagicGonads/sgg-mod-format
 
 __all__ = [
     #functions
-        "main", "configure_globals", "start", "preplogfile", "cleanup",
-        "safeget", "safeset", "dictmap", "hashfile",
-        "lua_addimport",
+        "main", "configure_globals", "start", "preplogfile", "stoplogfile",
+        "safeget", "safeset", "dictmap", "hashfile", "file_digests",
+        "fingerprints_load", "fingerprints_save", "hash_stream",
+        "base_copy", "unshare", "index_folder", "commit_edits", "discard_edits",
+        "load_manifest", "save_manifest", "target_fingerprint",
+        "make_base_edits_parallel", "parse_cached", "parsecache_evict",
+        "output_key", "output_fetch", "output_store", "outputcache_evict",
+        "import_mods", "plan_mods", "deploy_plan", "watch_mods", "new_watcher",
+        "profile_add", "profile_count", "profile_report",
+        "lua_addimport", "lua_merge", "hashdata", "modfile_parse", "intern_path",
         "xml_safeget", "xml_read", "xml_write", "xml_map", "xml_merge",
         "sjson_safeget", "sjson_clearDNE", "sjson_read", "sjson_write",
         "sjson_map", "sjson_merge", 
     #variables
         "configfile", "logfile_prefix", "logfile_suffix", "edited_suffix",
         "scopemods", "modsrel", "baserel", "editrel", "logsrel", "gamerel",
-        "do_log", "cfg_modify", "cfg_overwrite", "profile_use_special",
+        "manifest_name", "journal_name", "parsecache_folder", "fingerprints_name", "deployed_name",
+        "outputcache_folder", "do_output_cache", "output_cache_size",
+        "do_log", "do_incremental", "jobs",
+        "do_parse_cache", "parse_cache_size", "hash_mmap", "copy_strategies",
+        "do_profile_run", "profile_dump", "profile_json", "run_profile",
+        "cfg_modify", "cfg_overwrite", "cfg_plan", "cfg_watch",
+        "watch_debounce", "watch_interval", "profile_use_special",
     #modules
-        "logging","xml","sjson","yaml","hashlib",
+        "logging","xml","sjson","yaml","hashlib","xxhash",
     #other
         "DNE",
         ]
@@ -27,35 +40,58 @@ __author__ = 'Andre Issa'
 # Dependencies
 
 import os, sys, stat
-import logging
+import io
+import re
+import json
+import time
+import mmap
+import queue
+import atexit
 import warnings
-import hashlib
+import importlib
 from getopt import getopt
-from pathlib import Path
-from shutil import copyfile, rmtree
-from datetime import datetime
-from collections import defaultdict
-from distutils.dir_util import copy_tree
-from distutils.errors import DistutilsFileError
-
-## Importer Config
+from operator import attrgetter
+from collections import defaultdict, OrderedDict
 
 try:
-    import yaml # pip: PyYAML
+    import fcntl # unix only, used for reflinks
 except ModuleNotFoundError:
-    yaml = None
-
-## XML Handling
+    fcntl = None
+
+## Lazy Modules
+
+# imported on first use, so a run only loads the handlers it needs and
+# the help or a config edit loads none of them
+lazy_modules = {
+    'yaml':'yaml', # pip: PyYAML
+    'xxhash':'xxhash', # pip: xxhash
+    'sjson':'sjson', # pip: SJSON
+    'xml':'xml.etree.ElementTree',
+    'logging':'logging',
+    'hashlib':'hashlib',
+    'pickle':'pickle',
+    'futures':'concurrent.futures',
+    'ctypes':'ctypes',
+    'select':'select',
+    'struct':'struct',
+    'shutil':'shutil',
+    'datetime':'datetime',
+}
 
-import xml.etree.ElementTree as xml
+def lazy_import(name):
+    # the module, or None if it is not installed
+    scope = globals()
+    if name not in scope:
+        try:
+            scope[name] = importlib.import_module(lazy_modules[name])
+        except ModuleNotFoundError:
+            scope[name] = None
+    return scope[name]
 
-## SJSON Handling
-try:
-    import sjson  # pip: SJSON
-except ModuleNotFoundError:
-    sjson = None
-else:
-    from collections import OrderedDict
+def __getattr__(name):
+    if name in lazy_modules:
+        return lazy_import(name)
+    raise AttributeError("module "+repr(__name__)+" has no attribute "+repr(name))
 
 # Configurable Globals
 
@@ -69,6 +105,12 @@ logsrel = "Logs"
 logfile_prefix = "log-modimp "
 logfile_suffix = ".txt"
 edited_suffix = ".hash"
+manifest_name = "manifest.json"
+journal_name = "journal.json" # Only there while edits are being committed
+parsecache_folder = "Parse Cache" # Kept inside the edit cache
+outputcache_folder = "Output Cache" # Inside the edit cache unless configured
+fingerprints_name = "fingerprints.json"
+deployed_name = "deployed.json" # The files this importer deployed
 
 # Data Functionality
 
@@ -108,18 +150,220 @@ def dictmap(indict,mapdict):
             return indict
     return mapdict
 
+## Run profiling
+
+def profile_new():
+    return {'phases':{},'targets':{},'mods':{},'counters':{}}
+
+def profile_add(section,name,seconds,**counts):
+    if run_profile is None:
+        return
+    entry = run_profile[section].setdefault(name,{'seconds':0.0})
+    entry['seconds'] += seconds
+    for k,v in counts.items():
+        entry[k] = entry.get(k,0)+v
+
+def profile_count(name,n=1):
+    if run_profile is not None:
+        counters = run_profile['counters']
+        counters[name] = counters.get(name,0)+n
+
+def profile_merge(profile):
+    # adds what a worker process measured to this run's profile
+    for section in ('targets','mods'):
+        for name,entry in profile[section].items():
+            entry = dict(entry)
+            profile_add(section,name,entry.pop('seconds'),**entry)
+    for name,n in profile['counters'].items():
+        profile_count(name,n)
+
+def profile_table(section,columns,top=None):
+    rows = list(run_profile[section].items())
+    if top is not None:
+        rows = sorted(rows,key=lambda x:-x[1]['seconds'])[:top]
+    rows = [[name]+[str(round(entry.get(c,0),4)) for c in columns]
+            for name,entry in rows]
+    if not rows:
+        return
+    header = [section[:-1]]+columns
+    widths = [max(len(header[i]),*(len(row[i]) for row in rows))
+              for i in range(len(header))]
+    for row in [header]+rows:
+        alt_print(" "+row[0].ljust(widths[0])+"  "
+                  +"  ".join(v.rjust(w) for v,w in zip(row[1:],widths[1:])))
+    alt_print()
+
+def profile_report():
+    run_profile['total'] = sum(e['seconds'] for e in run_profile['phases'].values())
+    alt_print("\nRun profile ("+str(round(run_profile['total'],4))+" seconds):\n")
+    profile_table('phases',['seconds'])
+    profile_table('targets',['seconds','read','written'],profile_top)
+    profile_table('mods',['seconds','bytes'],profile_top)
+    for name,n in run_profile['counters'].items():
+        alt_print(" "+name+": "+str(n))
+    if profile_json:
+        with open(profile_json,'w') as f:
+            json.dump(run_profile,f,indent=1)
+
+## Parse caching
+
+def parse_cached(filename,kind,parse):
+    if not do_parse_cache:
+        return parse(filename)
+    try:
+        digest = file_digests(filename)[hashes[0]]
+    except OSError:
+        return parse(filename)
+    path = parsecachedir+'/'+digest+'.'+kind
+    pickle = lazy_import('pickle')
+    if parse_memo is not None:
+        # while watching, entries are kept in memory as pickles, so merging
+        # can never change the kept copy
+        blob = parse_memo.get(path) or parse_memo_last.get(path)
+        if blob is not None:
+            parse_memo[path] = blob
+            return pickle.loads(blob)
+    try:
+        with open(path,'rb') as f:
+            blob = f.read()
+        data = pickle.loads(blob)
+        if not cfg_plan:
+            os.utime(path)
+        if parse_memo is not None:
+            parse_memo[path] = blob
+        return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        alt_warn("Ignoring broken parse cache entry: "+path+" ("+repr(e)+")")
+    data = parse(filename)
+    if data is not DNE and not cfg_plan:
+        os.makedirs(parsecachedir, exist_ok=True)
+        blob = pickle.dumps(data,pickle.HIGHEST_PROTOCOL)
+        temp = path+'.'+str(os.getpid())+'.tmp'
+        with open(temp,'wb') as f:
+            f.write(blob)
+        os.replace(temp,path)
+        if parse_memo is not None:
+            parse_memo[path] = blob
+    return data
+
+def cache_evict(folder,size):
+    if not os.path.isdir(folder):
+        return
+    # evict the least recently used entries until the cache fits, the
+    # cache may be shared, so entries can vanish under us and files still
+    # being written (.tmp) are not ours to count or remove
+    entries = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries.append((st.st_mtime_ns,st.st_size,entry.name))
+                except FileNotFoundError:
+                    pass
+    except OSError as e:
+        alt_warn("Could not clean up cache "+folder+": "+repr(e))
+        return
+    entries.sort()
+    total = sum(e[1] for e in entries)
+    limit = size*2**20
+    while entries and total > limit:
+        _,size,name = entries.pop(0)
+        try:
+            os.remove(folder+'/'+name)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            alt_warn("Could not clean up cache "+folder+": "+repr(e))
+            return
+        total -= size
+
+def parsecache_evict():
+    if do_parse_cache:
+        cache_evict(parsecachedir,parse_cache_size)
+
+## Output caching
+
+def output_key(fingerprint):
+    # the merged output only depends on the base and the mods in order,
+    # by content, or by deployed path for lua imports, and on the line
+    # endings of the platform it was written on
+    mods = [[mode,digests+'/'+src if mode == 'lua' else digests,
+             priority] for src,mode,priority,digests in fingerprint['mods']]
+    data = json.dumps([__version__,os.linesep,fingerprint['base'],mods])
+    return lazy_import('hashlib').sha256(data.encode('utf-8')).hexdigest()
+
+def output_fetch(key,dst):
+    # the cache is best effort, any trouble with it is just a miss
+    path = outputcachedir+'/'+key
+    if not os.path.isfile(path):
+        return False
+    try:
+        # never a hard link, the live file must not share the cached one
+        base_copy(path,dst,False)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        alt_warn("Could not read output cache entry "+path+": "+repr(e))
+        return False
+    if not cfg_plan:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    return True
+
+def output_store(key,src):
+    # base_copy swaps the entry in whole, and a cache that can't be
+    # written doesn't stop the run
+    path = outputcachedir+'/'+key
+    try:
+        os.makedirs(outputcachedir, exist_ok=True)
+        base_copy(src,path,False)
+    except OSError as e:
+        alt_warn("Could not write output cache entry "+path+": "+repr(e))
+        try:
+            os.remove(path+'.'+str(os.getpid())+'.tmp')
+        except OSError:
+            pass
+
+def outputcache_evict():
+    if do_output_cache:
+        cache_evict(outputcachedir,output_cache_size)
+
 ## LUA import statement adding
 
 def lua_addimport(base,path):
+    unshare(base)
     with open(base,'a') as basefile:
         basefile.write("\nImport \"../"+path+"\"")
 
+def lua_merge(infile,*paths,out=None):
+    # all imports of the chain are appended with one write, a file that
+    # several mods import is only imported once
+    with open(infile,'rb') as basefile:
+        data = basefile.read()
+    imports = "".join("\nImport \"../"+path+"\"" for path in dict.fromkeys(paths))
+    data += imports.replace("\n",os.linesep).encode('utf-8')
+    out = out or infile
+    unshare(out,False)
+    with open(out,'wb') as basefile:
+        basefile.write(data)
+    return data
+
 ## XML mapping
 
 xml_RESERVED_replace = "_replace"
 xml_RESERVED_delete = "_delete"
+xml_RESERVED_key = "_key" # match children by this attribute, not position
 
 def xml_safeget(data,key):
+    xml = lazy_import('xml')
     if isinstance(data,list):
         if isinstance(key,int):
             if key < len(data) and key >= 0:
@@ -134,51 +378,111 @@ def xml_safeget(data,key):
     return DNE
 
 def xml_read(filename):
+    xml = lazy_import('xml')
     try:
         return xml.parse(filename)
     except xml.ParseError:
         return DNE
 
+xml_pattern_plain = re.compile(r'[^"<> \t]+')
+
+class xml_Formatter():
+    """ indentation styling applied to xml while it is written """
+
+    def __init__(self,file,start=None,blocksize=4096):
+        self.file = file
+        self.blocksize = blocksize
+        self.out = [start] if start else []
+        self.line = ''
+        self.cr = False
+        self.depth = 0
+
+    def write(self,chunk):
+        # same text the file would have read back as before
+        chunk = chunk.encode('ascii','xmlcharrefreplace').decode('ascii')
+        if self.cr:
+            chunk = '\r' + chunk
+        self.cr = chunk[-1:] == '\r'
+        if self.cr:
+            chunk = chunk[:-1]
+        lines = (self.line + chunk.replace('\r\n','\n')
+                 .replace('\r','\n')).split('\n')
+        self.line = lines.pop()
+        for line in lines:
+            self.format(line+'\n')
+        if len(self.out) > self.blocksize:
+            # the last piece stays behind in case a closing tag takes it back
+            self.file.write(''.join(self.out[:-1]))
+            del self.out[:-1]
+
+    def close(self):
+        if self.cr:
+            self.format(self.line+'\n')
+        elif self.line:
+            self.format(self.line)
+        self.line = ''
+        self.file.write(''.join(self.out))
+        self.out = []
+
+    def unput(self):
+        if self.out:
+            self.out[-1] = self.out[-1][:-1]
+            if not self.out[-1]:
+                self.out.pop()
+
+    def format(self,line):
+        if len(line.replace('\t','').replace(' ','')) <= 1:
+            return
+        out = self.out
+        i = self.depth
+        q = True
+        p = ''
+        k = 0
+        n = len(line)
+        while k < n:
+            if p not in ('<',' ',''):
+                # plain characters are copied as they are
+                m = xml_pattern_plain.match(line,k)
+                if m:
+                    k = m.end()
+                    out.append(m.group())
+                    p = line[k-1]
+                    continue
+            s = line[k]
+            if s == '"':
+                q = not q
+            if p == '<' and q:
+                if s == '/':
+                    i -= 1
+                    self.unput()
+                else:
+                    i += 1
+                out.append(p)
+            if s == '>' and p == '/' and q:
+                i -= 1
+            if p in (' ','') or (s == '>' and p == '"' and q):
+                out.append('\n' + '\t'*(i - (s == '/')))
+            if s not in (' ','\t','<') or not q:
+                out.append(s)
+            p = s
+            k += 1
+        self.depth = i
+
 def xml_write(filename,content,start=None):
     if not isinstance(filename,str):
         return
-    if not isinstance(content, xml.ElementTree):
+    if not isinstance(content, lazy_import('xml').ElementTree):
         return
-    content.write(filename)
-
-    # Indentation styling
-    data = ""
-    if start:
-        data = start
-    with open(filename,'r') as file:
-        i = 0
-        for line in file:
-            nl = False
-            if len(line.replace('\t','').replace(' ','')) > 1:
-                q = True
-                p = ''
-                for s in line:
-                    if s == '\"':
-                        q = not q
-                    if p == '<' and q:
-                        if s == '/':
-                            i -= 1
-                            data = data[:-1]
-                        else:
-                            i += 1
-                        data+=p
-                    if s == '>' and p == '/' and q:
-                        i -= 1
-                    if p in (' ') or (s == '>' and p == '\"') and q:
-                        data += '\n' + '\t'*(i - (s == '/'))
-                    if s not in (' ','\t','<') or not q:
-                        data += s
-                    p=s
-    open(filename,"w").write(data)
+    unshare(filename,False)
+    with open(filename,'w') as file:
+        formatter = xml_Formatter(file,start)
+        content.write(formatter,encoding='unicode')
+        formatter.close()
 
 def xml_map(indata,mapdata):
     if mapdata is DNE:
         return indata
+    xml = lazy_import('xml')
     if type(indata) == type(mapdata):
         if isinstance(mapdata,dict):
             for k,v in mapdata.items():
@@ -190,21 +494,38 @@ def xml_map(indata,mapdata):
                 indata._setroot(root)
             return indata
         elif isinstance(mapdata,xml.Element):
-            mtags = dict()
-            for v in mapdata:
-                if not mtags.get(v.tag,False):
-                    mtags[v.tag]=True
-            for tag in mtags:
-                mes = mapdata.findall(tag)
-                ies = indata.findall(tag)
+            # index the children by tag once rather than searching per tag
+            mtags = defaultdict(list)
+            for me in mapdata:
+                mtags[me.tag].append(me)
+            itags = defaultdict(list)
+            for ie in indata:
+                itags[ie.tag].append(ie)
+            key = mapdata.get(xml_RESERVED_key,None)
+            deleted = set()
+            for tag,mes in mtags.items():
+                ies = itags[tag]
+                if key:
+                    keyed = {}
+                    for ie in ies:
+                        keyed.setdefault(ie.get(key,None),ie)
                 for i,me in enumerate(mes):
-                    ie = xml_safeget(ies,i)
+                    if key and me.get(key,None) is not None:
+                        ie = keyed.get(me.get(key),DNE)
+                    else:
+                        ie = xml_safeget(ies,i)
                     if ie is DNE:
+                        # _key only guides matching, it never ends up in
+                        # the game's files
+                        for e in me.iter():
+                            e.attrib.pop(xml_RESERVED_key,None)
                         indata.append(me)
                         continue
+                    if id(ie) in deleted:
+                        continue
                     if me.get(xml_RESERVED_delete,None) \
                             not in {None,'0','false','False'}:
-                        indata.remove(ie)
+                        deleted.add(id(ie))
                         continue
                     if me.get(xml_RESERVED_replace,None) \
                             not in {None,'0','false','False'}:
@@ -212,18 +533,34 @@ def xml_map(indata,mapdata):
                         ie.tail = me.tail
                         ie.attrib = me.attrib
                         del ie.attrib[xml_RESERVED_replace]
+                        ie.attrib.pop(xml_RESERVED_key,None)
                         continue
                     ie.text = xml_map(ie.text,me.text)
                     ie.tail = xml_map(ie.tail,me.tail)
                     ie.attrib = xml_map(ie.attrib,me.attrib)
+                    ie.attrib.pop(xml_RESERVED_key,None)
                     xml_map(ie,me)
+            if deleted:
+                # deletions are applied together instead of one at a time
+                indata[:] = [ie for ie in indata if id(ie) not in deleted]
             return indata
         return mapdata
     else:
         return mapdata
     return mapdata
 
-def xml_merge(infile,mapfile):
+def xml_retext(data):
+    # between maps the chain used to be written and parsed back, which
+    # turned whitespace only text and tails holding a space or a line
+    # break into line breaks and indentation, written as one line break
+    for e in data.iter():
+        for attr in ('text','tail'):
+            text = getattr(e,attr)
+            if text and not text.strip(' \t\r\n'):
+                setattr(e,attr,'\n' if text.strip('\t') else None)
+
+def xml_merge(infile,*mapfiles,out=None):
+    xml = lazy_import('xml')
     start = ""
     with open(infile,'r') as file:
         for line in file:
@@ -231,155 +568,188 @@ def xml_merge(infile,mapfile):
                 start = line
                 break
     indata = xml_read(infile)
-    if mapfile:
-        mapdata = xml_read(mapfile)
-    else:
-        mapdata = DNE
-    indata = xml_map(indata,mapdata)
-    xml_write(infile,indata,start)
+    # the whole chain is applied in memory so the file is only parsed
+    # and written once
+    for i,mapfile in enumerate(mapfiles):
+        if i and isinstance(indata,xml.ElementTree):
+            xml_retext(indata)
+        if mapfile:
+            mapdata = xml_read(mapfile)
+        else:
+            mapdata = DNE
+        indata = xml_map(indata,mapdata)
+    xml_write(out or infile,indata,start)
 
 ## SJSON mapping
 
-if sjson is not None:
+sjson_RESERVED_sequence = "_sequence"
+sjson_RESERVED_append = "_append"
+sjson_RESERVED_replace = "_replace"
+sjson_RESERVED_delete = "_delete"
+sjson_RESERVED = {sjson_RESERVED_sequence,sjson_RESERVED_replace,
+                  sjson_RESERVED_delete}
 
-    sjson_RESERVED_sequence = "_sequence"
-    sjson_RESERVED_append = "_append"
-    sjson_RESERVED_replace = "_replace"
-    sjson_RESERVED_delete = "_delete"
-
-    def sjson_safeget(data,key):
-        if isinstance(data,list):
-            if isinstance(key,int):
-                if key < len(data) and key >= 0:
-                    return data[key]
-            return DNE
-        if isinstance(data,OrderedDict):
-            return data.get(key,DNE)
+def sjson_safeget(data,key):
+    if isinstance(data,list):
+        if isinstance(key,int):
+            if key < len(data) and key >= 0:
+                return data[key]
         return DNE
+    if isinstance(data,OrderedDict):
+        return data.get(key,DNE)
+    return DNE
 
-    def sjson_clearDNE(data):
-        if isinstance(data,OrderedDict):
-            for k,v in data.items():
-                if v is DNE:
-                    del data[k]
-                    continue
-                data[k] = sjson_clearDNE(v)
-        if isinstance(data,list):
-            L = []
-            for i,v in enumerate(data):
-                if v is DNE:
-                    continue
-                L.append(sjson_clearDNE(v))
-            data = L
-        return data
-    
-    def sjson_read(filename):
-        try:
-            return sjson.loads(open(filename).read().replace('\\','\\\\'))
-        except sjson.ParseException as e:
-            alt_print(repr(e))
-            return DNE
+def sjson_clearDNE(data):
+    if isinstance(data,OrderedDict):
+        for k,v in list(data.items()):
+            if v is DNE:
+                del data[k]
+                continue
+            data[k] = sjson_clearDNE(v)
+    if isinstance(data,list):
+        L = []
+        for i,v in enumerate(data):
+            if v is DNE:
+                continue
+            L.append(sjson_clearDNE(v))
+        data = L
+    return data
+
+def sjson_parse(filename):
+    sjson = lazy_import('sjson')
+    try:
+        return sjson.loads(open(filename).read().replace('\\','\\\\'))
+    except sjson.ParseException as e:
+        alt_print(repr(e))
+        return DNE
 
-    def sjson_write(filename,content):
-        if not isinstance(filename,str):
-            return
+def sjson_read(filename):
+    return parse_cached(filename,'sjson',sjson_parse)
+
+sjson_pattern_bracket = re.compile(r"(?<=[\[{])(?=[^\n])|(?<=[^\n])(?=[\]}])")
+
+class sjson_Formatter():
+    """ indentation styling applied to sjson while it is written """
+
+    def __init__(self,file,blocksize=65536):
+        self.file = file
+        self.blocksize = blocksize
+        self.chunks = []
+        self.size = 0
+        self.prev = ' '
+        self.line = ''
+        self.depth = 0
+        self.first = True
+
+    @staticmethod
+    def newlines(match):
+        i = match.start()
+        if match.string[i-1] in "{[" and match.string[i] in "}]":
+            return "\n\n"
+        return "\n"
+
+    def write(self,chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size >= self.blocksize:
+            self.flush()
+
+    def flush(self,final=False):
+        # brackets get their own lines, the previous block's last
+        # character is kept so breaks across blocks are still found
+        text = self.prev + ''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        self.prev = text[-1]
+        text = sjson_pattern_bracket.sub(self.newlines,text)[1:]
+        lines = (self.line + text).replace(", ","\n").split("\n")
+        if not final:
+            self.line = lines.pop()
+        for line in lines:
+            self.depth -= line.count("}") + line.count("]")
+            if not self.first:
+                self.file.write("\n")
+            self.first = False
+            self.file.write("  "*self.depth + line)
+            self.depth += line.count("{") + line.count("[")
+
+def sjson_write(filename,content):
+    if not isinstance(filename,str):
+        return
+    unshare(filename,False)
+    with open(filename, 'w') as f:
+        formatter = sjson_Formatter(f)
+        formatter.write('{\n')
         if isinstance(content,OrderedDict):
-            content = sjson.dumps(content)
-        else:
-            content = ""
-        with open(filename, 'w') as f:
-            s = '{\n' + content + '}'
-            
-            # Indentation styling
-            p = ''
-            S = ''
-            for c in s:
-                if c in ("{","[") and p in ("{","["):
-                    S += "\n"
-                if c in ("}","]") and p in ("}","]"):
-                    S += "\n"
-                S += c
-                if p in ("{","[") and c not in ("{","[","\n"):
-                    S = S[:-1] + "\n" + S[-1]
-                if c in ("}","]") and p not in ("}","]","\n"):
-                    S = S[:-1] + "\n" + S[-1]
-                p = c
-            s = S.replace(", ","\n").split('\n')
-            i = 0
-            L = []
-            for S in s:
-                for c in S:
-                    if c in ("}","]"):
-                        i = i - 1
-                L.append("  "*i+S)
-                for c in S:
-                    if c in ("{","["):
-                        i=i+1
-            s = '\n'.join(L)
-            
-            f.write(s)
-
-    def sjson_map(indata,mapdata):
-        if mapdata is DNE:
+            lazy_import('sjson').dump(content,formatter)
+        formatter.write('}')
+        formatter.flush(True)
+
+def sjson_map(indata,mapdata):
+    # deleted entries are dropped as they are found, so the result
+    # never contains DNE and needs no clean up pass
+    if mapdata is DNE:
+        return indata
+    if sjson_safeget(mapdata,sjson_RESERVED_sequence):
+        S = []
+        for k,v in mapdata.items():
+            try:
+                i = int(k)
+            except ValueError:
+                continue
+            # negative keys are skipped like other keys that aren't indices
+            if i < 0:
+                continue
+            d = i-len(S)
+            if d>=0:
+                S.extend([DNE]*(d+1))
+            S[i]=v
+        mapdata = S
+    if isinstance(mapdata,list):
+        tag = sjson_safeget(mapdata,0)
+        if tag == sjson_RESERVED_delete:
+            return DNE
+        if not isinstance(indata,list) or tag == sjson_RESERVED_replace:
+            indata = []
+        if tag in (sjson_RESERVED_replace,sjson_RESERVED_append):
+            for v in mapdata[1:]:
+                v = sjson_map(DNE,v)
+                if v is not DNE:
+                    indata.append(v)
             return indata
-        if sjson_safeget(mapdata,sjson_RESERVED_sequence):
-            S = []
-            for k,v in mapdata.items():
-                try:
-                    d = int(k)-len(S)
-                    if d>=0:
-                        S.extend([DNE]*(d+1))
-                    S[int(k)]=v
-                except ValueError:
-                    continue
-            mapdata = S
-        if type(indata)==type(mapdata):
-            if sjson_safeget(mapdata,0) != sjson_RESERVED_append \
-                           or isinstance(mapdata,OrderedDict):
-                if isinstance(mapdata,list):
-                    if sjson_safeget(mapdata,0) == sjson_RESERVED_delete:
-                        return DNE
-                    if sjson_safeget(mapdata,0) == sjson_RESERVED_replace:
-                        del mapdata[0]
-                        return mapdata
-                    indata.expand([DNE]*(len(mapdata) - len(indata)))
-                    for k,v in enumerate(mapdata):
-                        indata[k] = sjson_map(sjson_safeget(indata,k),v)
-                else:
-                    if sjson_safeget(mapdata,sjson_RESERVED_delete):
-                        return DNE
-                    if sjson_safeget(mapdata,sjson_RESERVED_replace):
-                        del mapdata[sjson_RESERVED_replace]
-                        return mapdata
-                    for k,v in mapdata.items():
-                        indata[k] = sjson_map(sjson_safeget(indata,k),v)
-                return indata
-            elif isinstance(mapdata,list):
-                for i in range(1,len(mapdata)):
-                    indata.append(mapdata[i])
-                return indata
-        else:
-            return mapdata
-        return mapdata
-        
-    def sjson_merge(infile,mapfile):
-        indata = sjson_read(infile)
+        L = []
+        for k in range(max(len(indata),len(mapdata))):
+            v = sjson_map(sjson_safeget(indata,k),sjson_safeget(mapdata,k))
+            if v is not DNE:
+                L.append(v)
+        indata[:] = L
+        return indata
+    if isinstance(mapdata,OrderedDict):
+        if sjson_safeget(mapdata,sjson_RESERVED_delete):
+            return DNE
+        if not isinstance(indata,OrderedDict) \
+                or sjson_safeget(mapdata,sjson_RESERVED_replace):
+            indata = OrderedDict()
+        for k,v in mapdata.items():
+            if k in sjson_RESERVED:
+                continue
+            v = sjson_map(sjson_safeget(indata,k),v)
+            if v is DNE:
+                indata.pop(k,None)
+            else:
+                indata[k] = v
+        return indata
+    return mapdata
+    
+def sjson_merge(infile,*mapfiles,out=None):
+    indata = sjson_read(infile)
+    for mapfile in mapfiles:
         if mapfile:
             mapdata = sjson_read(mapfile)
         else:
             mapdata = DNE
         indata = sjson_map(indata,mapdata)
-        indata = sjson_clearDNE(indata)
-        sjson_write(infile,indata)
-
-else:
-    
-    sjson_safeget = None
-    sjson_clearDNE = None
-    sjson_read = None
-    sjson_write = None
-    sjson_map = None
-    sjson_merge = None
+    sjson_write(out or infile,indata)
 
 # FILE/MOD CONTROL
 
@@ -402,69 +772,332 @@ class Signal():
                "("+self.truth.__repr__() + ',' + self.message.__repr__() + ')'
 
 hashes = ['md5']
-def hashfile(file,out=None,modes=hashes,blocksize=65536):
-    lines = []
-    for mode in modes:
-        hasher = hashlib.new(mode)
-        with open(file, 'rb') as afile:
-            buf = afile.read(blocksize)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = afile.read(blocksize)
-            lines.append(mode+'\t'+hasher.hexdigest())
-    content = "\n".join(lines)
+copy_strategies = ['reflink','hardlink','copy']
+copy_unsupported = set()
+
+def new_hasher(mode,data=b''):
+    if mode.startswith('xxh'):
+        xxhash = lazy_import('xxhash')
+        if xxhash is not None:
+            return getattr(xxhash,mode)(data)
+    return lazy_import('hashlib').new(mode,data)
+
+def hash_available(mode):
+    # xxh hashes need the xxhash module, anything else hashlib
+    try:
+        new_hasher(mode)
+    except (ValueError,AttributeError):
+        return False
+    return True
+
+def fingerprints_load():
+    global fingerprint_index
+    try:
+        with open(editdir+'/'+fingerprints_name,'r') as f:
+            fingerprint_index = json.load(f)
+    except (OSError,ValueError):
+        fingerprint_index = {}
+    if not isinstance(fingerprint_index,dict):
+        fingerprint_index = {}
+    fingerprint_used.clear()
+
+def fingerprints_save():
+    if fingerprint_index is None:
+        return
+    # only keep files that were looked at this run
+    index = {k:v for k,v in fingerprint_index.items() if k in fingerprint_used}
+    os.makedirs(editdir, exist_ok=True)
+    with open(editdir+'/'+fingerprints_name,'w') as f:
+        json.dump(index,f)
+
+def hash_blocksize(size):
+    # bigger files get bigger blocks, between 64 KiB and 8 MiB
+    return min(max(2**16,1 << max(size.bit_length()-6,0)),2**23)
+
+def hash_stream(afile,hashers,size,blocksize=None,mapped=None):
+    if blocksize is None:
+        blocksize = hash_blocksize(size)
+    if mapped is None:
+        mapped = hash_mmap
+    if mapped and size > 0:
+        try:
+            data = mmap.mmap(afile.fileno(),0,access=mmap.ACCESS_READ)
+        except (OSError,ValueError):
+            pass
+        else:
+            # hash straight out of the page cache, slices of a memoryview
+            # don't copy
+            with data:
+                view = memoryview(data)
+                try:
+                    for i in range(0,len(view),blocksize):
+                        block = view[i:i+blocksize]
+                        for hasher in hashers:
+                            hasher.update(block)
+                        block.release()
+                finally:
+                    view.release()
+            return
+    buf = bytearray(blocksize)
+    view = memoryview(buf)
+    n = afile.readinto(buf)
+    while n:
+        for hasher in hashers:
+            hasher.update(view[:n])
+        n = afile.readinto(buf)
+    view.release()
+
+def file_digests(file,modes=None,blocksize=None):
+    if modes is None:
+        modes = hashes
+    if fingerprint_index is None:
+        fingerprints_load()
+    st = os.stat(file)
+    key = os.path.abspath(file).replace("\\","/")
+    sig = [st.st_size,st.st_mtime_ns,st.st_ino]
+    fingerprint_used.add(key)
+    entry = fingerprint_index.get(key)
+    if entry and entry[0] == sig:
+        digests = entry[1]
+        if all(mode in digests for mode in modes):
+            return digests
+    else:
+        digests = {}
+    # every hasher is fed from the same read of the file
+    hashers = {mode:new_hasher(mode) for mode in modes if mode not in digests}
+    with open(file,'rb') as afile:
+        hash_stream(afile,hashers.values(),st.st_size,blocksize)
+    profile_count('bytes hashed',st.st_size)
+    for mode,hasher in hashers.items():
+        digests[mode] = hasher.hexdigest()
+    # a file changed within the same mtime tick would look unchanged,
+    # so only files that have been still for a while are indexed
+    if time.time_ns() - st.st_mtime_ns > 2*10**9:
+        fingerprint_index[key] = [sig,digests]
+    return digests
+
+def hashfile(file,out=None,modes=None,blocksize=None):
+    if modes is None:
+        modes = hashes
+    digests = file_digests(file,modes,blocksize)
+    content = "\n".join(mode+'\t'+digests[mode] for mode in modes)
     if out:
         with open(out, 'w') as ofile:
             ofile.write(content)
     return content
 
+def hashdata(data,modes=None):
+    if modes is None:
+        modes = hashes
+    return "\n".join(mode+'\t'+new_hasher(mode,data).hexdigest() for mode in modes)
+
+## Base cache copies
+
+FICLONE = 0x40049409 # linux ioctl to share the extents of another file
+
+def copy_reflink(src,dst):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    try:
+        with open(src,'rb') as fsrc, open(dst,'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(),FICLONE,fsrc.fileno())
+    except OSError:
+        os.remove(dst)
+        raise
+
+def copy_hardlink(src,dst):
+    # writes to either file must replace it rather than change it in place,
+    # see unshare
+    os.link(src,dst)
+
+def copy_bytes(src,dst):
+    lazy_import('shutil').copyfile(src,dst)
+
+copy_methods = {
+    'reflink': copy_reflink,
+    'hardlink': copy_hardlink,
+    'copy': copy_bytes,
+}
+
+def base_copy(src,dst,links=True):
+    # returns the strategy that was used, trying the cheapest ones first,
+    # links only work within a filesystem so failures are remembered for
+    # both ends
+    devs = (os.stat(src).st_dev,os.stat(os.path.dirname(dst) or '.').st_dev)
+    temp = dst+'.'+str(os.getpid())+'.tmp'
+    for strategy in copy_strategies:
+        if (strategy,)+devs in copy_unsupported or not links and strategy == 'hardlink':
+            continue
+        try:
+            copy_methods[strategy](src,temp)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            if strategy != 'copy':
+                copy_unsupported.add((strategy,)+devs)
+                continue
+            raise
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        os.replace(temp,dst)
+        return strategy
+    lazy_import('shutil').copyfile(src,dst)
+    return 'copy'
+
+def unshare(filename,keep=True):
+    # a hard linked file is replaced by its own copy before it gets written,
+    # so the other link keeps the old content
+    try:
+        if os.stat(filename).st_nlink < 2:
+            return
+    except FileNotFoundError:
+        return
+    if not keep:
+        os.remove(filename)
+        return
+    temp = filename+'.'+str(os.getpid())+'.tmp'
+    lazy_import('shutil').copyfile(filename,temp)
+    os.replace(temp,filename)
+
+## Mod discovery
+
+def index_folder(folder):
+    # every directory is listed once, on a thread of its own, and the index
+    # maps each path to (is_dir, size, mtime_ns, children)
+    def scan(path):
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        # symlinked folders are followed, so they are told
+                        # apart by what they point to
+                        st = os.stat(entry.path)
+                        entries.append((entry.name,True,0,0,(st.st_dev,st.st_ino)))
+                    else:
+                        st = entry.stat()
+                        entries.append((entry.name,False,st.st_size,st.st_mtime_ns,None))
+                except OSError:
+                    pass
+        return path, entries
+    index = {folder:(True,0,0,[])}
+    st = os.stat(folder)
+    ancestors = {folder:((st.st_dev,st.st_ino),)}
+    futures = lazy_import('futures')
+    with futures.ThreadPoolExecutor() as pool:
+        pending = {pool.submit(scan,folder)}
+        while pending:
+            done, pending = futures.wait(pending,return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                path, entries = future.result()
+                children = index[path][3]
+                for name,isdir,size,mtime,ident in entries:
+                    child = path+'/'+name
+                    children.append(child)
+                    if isdir:
+                        index[child] = (True,0,0,[])
+                        # a link back to a folder it is inside of would
+                        # never end, it is kept as an empty folder
+                        if ident not in ancestors[path]:
+                            ancestors[child] = ancestors[path]+(ident,)
+                            pending.add(pool.submit(scan,child))
+                    else:
+                        index[child] = (False,size,mtime,None)
+    return index
+
+def index_entry(path):
+    # paths in the mods folder are answered from the index made at the
+    # start of the run, anything else from the disk
+    if mod_index is not None:
+        key = os.path.normpath(path).replace("\\","/")
+        if key == modsdir or key.startswith(modsdir+'/'):
+            return mod_index.get(key)
+    try:
+        st = os.stat(path)
+    except (OSError,ValueError):
+        return None
+    return (stat.S_ISDIR(st.st_mode),st.st_size,st.st_mtime_ns,None)
+
+def index_children(path):
+    entry = index_entry(path)
+    if entry is None or not entry[0]:
+        return []
+    if entry[3] is not None:
+        return entry[3]
+    return [e.path.replace("\\","/") for e in os.scandir(path)]
+
+## Scope classification
+
+def path_parts(path):
+    # paths are compared by component, so Mods2 is not inside Mods
+    parts = path_cache.get(path)
+    if parts is None:
+        parts = os.path.normcase(os.path.abspath(path)).replace("\\","/")
+        parts = path_cache[path] = tuple(parts.split("/"))
+    return parts
+
+def is_under(parts,folder):
+    root = path_parts(folder)
+    return parts[:len(root)] == root
+
+def scope_class(filename):
+    key = (filename,local_in_scope,base_in_scope,edit_in_scope)
+    where = scope_cache.get(key)
+    if where is not None:
+        return where
+    parts = path_parts(filename)
+    n = len(path_parts(localdir))
+    if local_in_scope and is_under(parts,localdir) and len(parts) > n \
+       and parts[n] in localsources:
+        where = "IsLocalSource"
+    elif base_in_scope and is_under(parts,basedir):
+        where = "InBase"
+    elif edit_in_scope and is_under(parts,editdir):
+        where = "InEdits"
+    elif is_under(parts,scopedir):
+        where = "InScope"
+    else:
+        where = "OutOfScope"
+    scope_cache[key] = where
+    return where
+
 def is_subfile(filename,folder):
-    if os.path.exists(filename):
-        if os.path.commonprefix([filename, folder]) == folder:
-            if os.path.isfile(filename):
+    entry = index_entry(filename)
+    if entry is not None:
+        if is_under(path_parts(filename),folder):
+            if not entry[0]:
                 return Signal(True,"SubFile")
             return Signal(False,"SubDir")
         return Signal(False,"NonSub")
     return Signal(False,"DoesNotExist")
 
 def in_scope(filename,permit_DNE=False):
-    if os.path.exists(filename) or permit_DNE:
-        if local_in_scope:
-            tfile = filename[len(os.path.commonprefix([filename, localdir])):]
-            tfile = tfile.split("/")[1]
-            if tfile in localsources:
-                return Signal(False,"IsLocalSource")
-        if base_in_scope:
-            if os.path.commonprefix([filename, basedir]) == basedir:
-                return Signal(False,"InBase")
-        if edit_in_scope:
-            if os.path.commonprefix([filename, editdir]) == editdir:
-                return Signal(False,"InEdits")
-        if os.path.commonprefix([filename, scopedir]) == scopedir:
-            if os.path.isfile(filename):
+    entry = index_entry(filename)
+    if entry is not None or permit_DNE:
+        where = scope_class(filename)
+        if where == "InScope":
+            if entry is not None and not entry[0]:
                 return Signal(True,"FileInScope")
             return Signal(False,"DirInScope")
-        return Signal(False,"OutOfScope")
+        return Signal(False,where)
     return Signal(False,"DoesNotExist")
 
 def alt_print(*args,**kwargs):
+    if echo_buffer is not None:
+        return print(file=echo_buffer,*args,**kwargs)
     if do_echo:
         return print(*args,**kwargs)
     if do_log:
-        tlog = logsdir+'/'+'temp-'+logfile_prefix+thetime()+logfile_suffix
-        f=open(tlog,'w')
-        print(file=f,*args,**kwargs)
-        f.close()
-        f=open(tlog,'r')
-        data=f.read()
-        f.close()
-        os.remove(tlog)
-        return logging.getLogger(__name__).info(data)
+        buffer = io.StringIO()
+        print(file=buffer,*args,**kwargs)
+        return lazy_import('logging').getLogger(__name__).info(buffer.getvalue())
 
 def alt_warn(message):
     warnings.warn(message,stacklevel = 2)
     if do_log and do_echo:
-        logging.getLogger(__name__).warning(message)
+        lazy_import('logging').getLogger(__name__).warning(message)
 
 def alt_input(*args,**kwargs):
     if do_echo:
@@ -473,15 +1106,9 @@ def alt_input(*args,**kwargs):
         print(*args)
         return kwargs.get('default',None)
     if do_log:
-        tlog = logsdir+'/'+'temp-'+logfile_prefix+thetime()+logfile_suffix
-        f=open(tlog,'w')
-        print(file=f,*args)
-        f.close()
-        f=open(tlog,'r')
-        data=f.read()
-        f.close()
-        os.remove(tlog)        
-        logging.getLogger(__name__).info(data)
+        buffer = io.StringIO()
+        print(file=buffer,*args)
+        lazy_import('logging').getLogger(__name__).info(buffer.getvalue())
         if do_input:
             return input()
         return kwargs.get('default',None)
@@ -490,80 +1117,121 @@ def alt_exit(code=None):
     alt_input("Press any key to end program...")
     exit(code)
 
-def modfile_splitlines(body):
-    glines = map(lambda s: s.strip().split("\""),body.split("\n"))
-    lines = []
-    li = -1
-    mlcom = False
-    def gp(group,lines,li,mlcom,even):
-        if mlcom:
-            tgroup = group.split(modfile_mlcom_end,1)
-            if len(tgroup)==1: # still commented, carry on
-                even = not even
-                return (lines,li,mlcom,even)
-            else: # comment ends, if a quote, even is disrupted
-                even = False
-                mlcom = False
-                group = tgroup[1]
-        if even:
-            lines[li]+="\""+group+"\""
-        else:
-            tgroup = group.split(modfile_comment,1)
-            tline = tgroup[0].split(modfile_mlcom_start,1)
-            tgroup = tline[0].split(modfile_linebreak)
-            lines[li]+=tgroup[0] # uncommented line
-            for g in tgroup[1:]: # new uncommented lines
-                lines.append(g)
-                li+=1
-            if len(tline)>1: # comment begins
-                mlcom = True
-                lines,li,mlcom,even = gp(tline[1],lines,li,mlcom,even)
-        return (lines,li,mlcom,even)
-    for groups in glines:
-        even = False
-        li += 1
-        lines.append("")
-        for group in groups:
-            lines,li,mlcom,even = gp(group,lines,li,mlcom,even)
-            even = not even
-    return lines
-
-def modfile_tokenise(line):
-    groups = line.strip().split("\"")
-    for i,group in enumerate(groups):
-        if i%2:
-            groups[i] = [group]
-        else:
-            groups[i] = group.replace(" ",modfile_delimiter)
-            groups[i] = groups[i].split(modfile_delimiter)
+def modfile_pattern():
+    specials = "|".join(map(re.escape,(modfile_comment,modfile_mlcom_start,
+                                       modfile_linebreak,modfile_delimiter)))
+    return re.compile(
+        r'(?P<quote>"[^"\n]*"?)'
+        r'|(?P<comment>'+re.escape(modfile_comment)+r'[^\n]*)'
+        r'|(?P<mlcom>'+re.escape(modfile_mlcom_start)+r'.*?(?:'
+            +re.escape(modfile_mlcom_end)+r'|\Z))'
+        r'|(?P<newline>\n)'
+        r'|(?P<linebreak>'+re.escape(modfile_linebreak)+r')'
+        r'|(?P<space>(?:[^\S\n]|'+re.escape(modfile_delimiter)+r')+)'
+        r'|(?P<word>(?:(?!'+specials+r')[^"\s])+)',re.S)
+
+def modfile_lines(body,errors=None):
+    # one pass over the text, yields the tokens of each command along
+    # with the line it starts on
+    line = start = 1
     tokens = []
-    for group in groups:
-        for x in group:
-            if x != '':
-                tokens.append(x)
-    return tokens
+    for match in modfile_pattern().finditer(body):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'word':
+            if not tokens:
+                start = line
+            tokens.append(text)
+        elif kind == 'quote':
+            if len(text) == 1 or text[-1] != '"':
+                if errors is not None:
+                    errors.append((line,"unterminated quote"))
+                text = text.rstrip()+'"'
+            if len(text) > 2:
+                if not tokens:
+                    start = line
+                tokens.append(text[1:-1])
+        elif kind == 'mlcom':
+            if not text.endswith(modfile_mlcom_end) and errors is not None:
+                errors.append((line,"unterminated comment"))
+            if '\n' in text:
+                if tokens:
+                    yield start, tokens
+                    tokens = []
+                line += text.count('\n')
+        elif kind in ('newline','linebreak'):
+            if tokens:
+                yield start, tokens
+                tokens = []
+            if kind == 'newline':
+                line += 1
+    if tokens:
+        yield start, tokens
+
+def modfile_parse(body):
+    # compiles a modfile into a list of (line, command, arguments)
+    keywords = (('to',KWRD_to),('priority',KWRD_load+KWRD_priority),
+                ('include',KWRD_include),('deploy',KWRD_deploy),
+                ('lua',KWRD_import),('xml',KWRD_xml),('sjson',KWRD_sjson))
+    commands = []
+    errors = []
+    for line,tokens in modfile_lines(body,errors):
+        for command,keyword in keywords:
+            if tokens[:len(keyword)] == keyword:
+                args = tokens[len(keyword):]
+                break
+        else:
+            errors.append((line,"unknown command "+tokens[0]))
+            continue
+        if command == 'priority':
+            try:
+                args = [int(x) for x in args[:1]]
+            except ValueError:
+                errors.append((line,"priority is not an integer"))
+                continue
+        elif not args:
+            errors.append((line,"missing arguments"))
+            continue
+        commands.append((line,command,args))
+    errors.sort()
+    return commands, errors
+
+def modfile_read(filename):
+    with open(filename,'r') as file:
+        return modfile_parse(file.read())
+
+def intern_path(path):
+    # every source path is stored once, mods refer to it by its id
+    i = path_ids.get(path)
+    if i is None:
+        i = path_ids[path] = len(path_table)
+        path_table.append(path)
+    return i
 
 class Mod():
-    """ modcode data structure """
-    
-    mode = ""
-    
-    def __init__(self,src,data,mode,key,index,**load):
+    """ modcode data structure, src is a tuple of ids into path_table """
+
+    __slots__ = ('src','mode','key','id','priority')
+
+    def __init__(self,src,mode,key,index,priority):
         self.src = src
-        self.data = data
         self.mode = mode
         self.key = key
         self.id = index
-        self.load = {"priority":default_priority}
-        self.load.update(load)
+        self.priority = priority
 
+    def sources(self):
+        return tuple(path_table[i] for i in self.src)
 
-# FILE/MOD LOADING
+    def deployed(self):
+        return tuple(deploy_from_scope+'/'+path_table[i] for i in self.src)
 
-def modfile_startswith(tokens,keyword,n):
-    return tokens[:len(keyword)] == keyword and len(tokens)>=len(keyword)+1
 
-def modfile_loadcommand(reldir,tokens,to,n,mode,cfg={},**load):
+# FILE/MOD LOADING
+
+def modfile_loadcommand(reldir,tokens,to,n,mode,cfg={},priority=None):
+    if priority is None:
+        priority = default_priority
     for scopepath in to:
         path = scopedir+'/'+scopepath
         if in_scope(path):
@@ -575,11 +1243,12 @@ def modfile_loadcommand(reldir,tokens,to,n,mode,cfg={},**load):
                 paths = []
                 num = -1
                 for source in sources:
-                    if os.path.isdir(modsdir+'/'+source):
+                    entry = index_entry(modsdir+'/'+source)
+                    if entry is not None and entry[0]:
                         tpath = []
-                        for file in os.scandir(source):
-                            file = file.path.replace("\\","/")
-                            if in_scope(file):
+                        for file in index_children(modsdir+'/'+source):
+                            file = source+'/'+file.split('/')[-1]
+                            if in_scope(modsdir+'/'+file):
                                 tpath.append(file)
                         paths.append(tpath)
                         if num > len(tpath) or num < 0:
@@ -592,169 +1261,589 @@ def modfile_loadcommand(reldir,tokens,to,n,mode,cfg={},**load):
                                    else x for x in paths]
                         for src in sources:
                             todeploy[src]=dictmap(todeploy.get(src,cfg),cfg)
-                        f = lambda x: map(lambda y: deploy_from_scope+'/'+y,x)
-                        codes[scopepath].append(Mod('\n'.join(sources),
-                                               tuple(f(sources)),mode,scopepath,
-                                               len(codes[scopepath]),**load))
+                        codes[scopepath].append(Mod(tuple(map(intern_path,sources)),
+                                                    mode,scopepath,len(codes[scopepath]),
+                                                    priority))
 
 def modfile_load(filename,echo=True):
     sig = is_subfile(filename,modsdir)
     if sig:
         prefix = os.path.commonprefix([filename,modsdir])
         relname = filename[len(prefix)+1:]
+        # parsed modfiles are cached by content, unchanged ones are
+        # not read again
         try:
-            file = open(filename,'r')
-        except IOError:
+            commands, errors = parse_cached(filename,'modfile',modfile_read)
+        except OSError:
             return
         if echo:
             alt_print(relname)
+        for line,message in errors:
+            alt_warn(relname+" line "+str(line)+": "+message)
 
         reldir = "/".join(relname.split("/")[:-1])
         p = default_priority
         to = default_target
         cfg = {}
         
-        with file:    
-            for line in modfile_splitlines(file.read()):
-                tokens = modfile_tokenise(line) 
-                if len(tokens)==0:
-                    continue
+        for line,command,args in commands:
+            if command == 'to':
+                to = [s.replace("\\","/") for s in args]
+            elif command == 'priority':
+                p = args[0] if args else default_priority
+            elif command == 'include':
+                for s in args:
+                    modfile_load(reldir+"/"+
+                                 s.replace("\"","").replace("\\","/"),echo)
+            elif command == 'deploy':
+                for s in args:
+                    check = is_subfile(s,modsdir)
+                    if check:
+                        todeploy[s]=dictmap(todeploy.get(s,cfg),cfg)
+                    elif check.message == "SubDir":
+                        for S in index_children(s):
+                            todeploy[S]=dictmap(todeploy.get(S,cfg),cfg)
+            elif command == 'sjson' and lazy_import('sjson') is None:
+                alt_warn("SJSON module not found! Skipped command on line "
+                         +str(line)+" of "+relname)
+            else:
+                modfile_loadcommand(reldir,args,to,1,command,cfg,priority=p)
 
-                elif modfile_startswith(tokens,KWRD_to,0):
-                    to = [s.replace("\\","/") for s in tokens[1:]]
-                    if len(to) == 0:
-                        to = default_target
-                elif modfile_startswith(tokens,KWRD_load,0):
-                    n = len(KWRD_load)+len(KWRD_priority)
-                    if tokens[len(KWRD_load):n] == KWRD_priority:
-                        if len(tokens)>n:
-                            try:
-                                p = int(tokens[n])
-                            except ValueError:
-                                pass
-                        else:
-                            p = default_priority
-                if modfile_startswith(tokens,KWRD_include,1):
-                    for s in tokens[1:]:
-                        modfile_load(reldir+"/"+
-                                     s.replace("\"","").replace("\\","/"),echo)
-                elif modfile_startswith(tokens,KWRD_deploy,1):
-                    for s in tokens[1:]:
-                        check = is_subfile(s,modsdir)
-                        if check:
-                            todeploy[s]=dictmap(todeploy.get(s,cfg),cfg)
-                        elif check.message == "SubDir":
-                            for f in os.scandir(s):
-                                S=f.path.replace("\\","/")
-                                todeploy[S]=dictmap(todeploy.get(S,cfg),cfg)
-                            
-                elif modfile_startswith(tokens,KWRD_import,1):
-                    modfile_loadcommand(reldir,tokens[len(KWRD_import):],
-                                        to,1,'lua',cfg,priority=p)
-                elif modfile_startswith(tokens,KWRD_xml,1):
-                    modfile_loadcommand(reldir,tokens[len(KWRD_xml):],
-                                        to,1,'xml',cfg,priority=p)
-                elif modfile_startswith(tokens,KWRD_sjson,1):
-                    if sjson:
-                        modfile_loadcommand(reldir,tokens[len(KWRD_sjson):],
-                                        to,1,'sjson',cfg,priority=p)
-                    else:
-                        alt_warn("SJSON module not found! Skipped command: "+line)
-                        
     elif sig.message == "SubDir":
-        for file in os.scandir(filename):
-            modfile_load(file.path.replace("\\","/"),echo)
+        for file in index_children(filename):
+            modfile_load(file,echo)
+
+def edit_matches(base,data):
+    # compare with the hashes the file was recorded with, those that can't
+    # be computed here any more are left out, a record with none left is
+    # trusted rather than have the edited file taken for a new base
+    lines = [line for line in data.split('\n')
+             if hash_available(line.split('\t')[0])]
+    if not lines:
+        return True
+    modes = [line.split('\t')[0] for line in lines]
+    return '\n'.join(lines) == hashfile(scopedir+'/'+base,modes=modes)
+
+def load_journal():
+    try:
+        with open(editdir+'/'+journal_name,'r') as f:
+            journal = json.load(f)
+    except (OSError,ValueError):
+        return {}
+    return journal if isinstance(journal,dict) else {}
 
 def is_edited(base):
     if os.path.isfile(editdir+'/'+base+edited_suffix):
         efile = open(editdir+'/'+base+edited_suffix,'r')
         data = efile.read()
         efile.close()
-        return data == hashfile(scopedir+'/'+base)
-    return False
+        if edit_matches(base,data):
+            return True
+    # a commit stopped after swapping the file but before recording it
+    data = load_journal().get(base)
+    return data is not None and os.path.isfile(scopedir+'/'+base) \
+           and edit_matches(base,data)
+
+def recover_edits():
+    # finishes recording a commit that was stopped halfway, and removes
+    # the temp files it didn't get to swap in
+    journal = load_journal()
+    for base,data in journal.items():
+        folder,name = (scopedir+'/'+base).rsplit('/',1)
+        pattern = re.compile(re.escape(name)+r'\.\d+\.tmp')
+        if os.path.isdir(folder):
+            for entry in os.listdir(folder):
+                if pattern.fullmatch(entry):
+                    os.remove(folder+'/'+entry)
+        if os.path.isfile(scopedir+'/'+base) and edit_matches(base,data):
+            os.makedirs(editdir+"/"+"/".join(base.split("/")[:-1]), exist_ok=True)
+            with open(editdir+'/'+base+edited_suffix,'w') as f:
+                f.write(data)
+    if os.path.exists(editdir+'/'+journal_name):
+        os.remove(editdir+'/'+journal_name)
+
+def target_source(base):
+    # an edited target is rendered again from its base cache copy
+    if is_edited(base) and os.path.isfile(basedir+'/'+base):
+        return basedir+'/'+base
+    return scopedir+'/'+base
+
+def cached_targets():
+    targets = set()
+    for folder,suffix in ((basedir,''),(editdir,edited_suffix)):
+        for root,dirs,files in os.walk(folder):
+            root = root.replace("\\","/")
+            if root == parsecachedir:
+                dirs[:] = []
+                continue
+            for name in files:
+                if name.endswith(suffix):
+                    path = root+'/'+name[:len(name)-len(suffix)]
+                    targets.add(path[len(folder)+1:])
+    return targets
+
+def prune_dirs(folder):
+    for root,dirs,files in os.walk(folder,topdown=False):
+        if root != folder and not os.listdir(root):
+            os.rmdir(root)
+
+def target_fingerprint(base,mods):
+    entries = []
+    for mod in mods:
+        # lua imports only depend on the path they import from, not on
+        # the file content
+        if mod.mode == 'lua':
+            digests = deploy_from_scope
+        else:
+            digests = [hashfile(modsdir+'/'+src) for src in mod.sources()]
+        entries.append(['\n'.join(mod.sources()),mod.mode,mod.priority,digests])
+    return {'base':hashfile(target_source(base)),'mods':entries}
 
-def deploy_mods():
-    for fs,cfg in todeploy.items():
-        Path(deploydir+"/"+"/".join(fs.split("/")[:-1])).mkdir(parents=True, exist_ok=True)
-        copyfile(modsdir+'/'+fs,deploydir+"/"+fs)
+def load_manifest():
+    try:
+        with open(editdir+'/'+manifest_name,'r') as f:
+            manifest = json.load(f)
+    except (OSError,ValueError):
+        return None
+    if not isinstance(manifest,dict):
+        return None
+    return manifest
 
-def sort_mods(base,mods):
-    codes[base].sort(key=lambda x: x.load['priority'])
-    for i in range(len(mods)):
-        mods[i].id=i
+def save_manifest(manifest):
+    os.makedirs(editdir, exist_ok=True)
+    with open(editdir+'/'+manifest_name,'w') as f:
+        json.dump(manifest,f,indent=1)
 
-def make_base_edits(base,mods,echo=True):
-    Path(basedir+"/"+"/".join(base.split("/")[:-1])).mkdir(parents=True, exist_ok=True)
-    copyfile(scopedir+'/'+base,basedir+"/"+base)
-    if echo:
-        i=0
-        alt_print("\n"+base)
+def load_deployed():
+    # the files deployed by the last run, relative to the deploy folder
+    # they went to, files put there by anyone else are never listed
+    try:
+        with open(editdir+'/'+deployed_name,'r') as f:
+            record = json.load(f)
+    except (OSError,ValueError):
+        return set()
+    if not isinstance(record,dict) or record.get('folder') != deploydir:
+        return set()
+    return set(record.get('files',[]))
+
+def save_deployed(files):
+    os.makedirs(editdir, exist_ok=True)
+    with open(editdir+'/'+deployed_name,'w') as f:
+        json.dump({'folder':deploydir,'files':sorted(files)},f,indent=1)
+
+def restore_target(base,echo=True):
+    basefile = basedir+'/'+base
+    if os.path.isfile(basefile):
+        strategy = None
+        if is_edited(base):
+            strategy = base_copy(basefile,scopedir+'/'+base)
+        if echo:
+            alt_print(base+(" ["+strategy+"]" if strategy else ""))
+        os.remove(basefile)
+    if os.path.isfile(editdir+'/'+base+edited_suffix):
+        os.remove(editdir+'/'+base+edited_suffix)
+
+def deploy_file(src,dst,mtime):
+    # the copy gets the mtime of its source, so the next run can tell it
+    # is still current
+    if base_copy(src,dst) != 'hardlink':
+        os.utime(dst,ns=(mtime,mtime))
+
+def deploy_owned():
+    # stale files are only removed from a deploy folder of our own
+    parts = path_parts(deploydir)
+    return parts != path_parts(scopedir) and is_under(parts,scopedir) \
+           and not any(is_under(path_parts(d),deploydir)
+                       for d in (modsdir,basedir,editdir))
+
+def deploy_plan():
+    # only files that changed since they were last deployed need copying,
+    # files the last run deployed that no mod deploys any more are stale
+    deployed = index_folder(deploydir) if os.path.isdir(deploydir) else {}
+    wanted = set()
+    todo = []
+    for fs in todeploy:
+        src = modsdir+'/'+fs
+        dst = os.path.normpath(deploydir+"/"+fs).replace("\\","/")
+        wanted.add(dst)
+        entry = index_entry(src) or (False,-1,0,None)
+        old = deployed.get(dst)
+        if old is not None and not old[0] and old[1:3] == entry[1:3]:
+            continue
+        todo.append((src,dst,entry[2],max(entry[1],0)))
+    stale = []
+    if deploy_owned():
+        for rel in sorted(load_deployed()):
+            path = deploydir+'/'+rel
+            entry = deployed.get(path)
+            if entry is not None and not entry[0] and path not in wanted:
+                stale.append(path)
+    return todo, stale, wanted
 
+def deploy_mods():
+    # new files are copied before any target is merged, stale ones are
+    # only removed by deploy_prune once the targets importing them are gone
+    todo, stale, wanted = deploy_plan()
+    profile_count('bytes deployed',sum(job[3] for job in todo))
+    profile_count('files deployed',len(todo))
+    # recorded first, so files copied by a run that fails are still ours
+    save_deployed(load_deployed() | {path[len(deploydir)+1:] for path in wanted})
+    for folder in sorted({job[1].rsplit('/',1)[0] for job in todo}):
+        os.makedirs(folder, exist_ok=True)
+    with lazy_import('futures').ThreadPoolExecutor() as pool:
+        for future in [pool.submit(deploy_file,*job[:3]) for job in todo]:
+            future.result()
+    return stale, wanted
+
+def deploy_prune(stale,wanted):
+    for path in stale:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        # only folders emptied by this are removed
+        folder = os.path.dirname(path)
+        while folder != deploydir and is_under(path_parts(folder),deploydir) \
+              and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+    save_deployed(path[len(deploydir)+1:] for path in wanted)
+
+def sort_mods(base,mods):
+    mods.sort(key=attrgetter('priority'))
+    for i,mod in enumerate(mods):
+        mod.id = i
+
+merges = {'lua':lua_merge,'xml':xml_merge,'sjson':sjson_merge}
+
+def make_base_edits(base,mods,echo=True,key=None):
+    # the target is rendered from its unmodified source into a temp file
+    # next to it, the live file is only swapped in by commit_edits
+    target = scopedir+'/'+base
+    source = target_source(base)
+    if source == target:
+        os.makedirs(basedir+"/"+"/".join(base.split("/")[:-1]), exist_ok=True)
+        strategy = base_copy(target,basedir+"/"+base)
+    else:
+        strategy = "cached"
+    work = target+'.'+str(os.getpid())+'.tmp'
+    done = False
     try:
-        for mod in mods:
-            if mod.mode == 'lua':
-                lua_addimport(scopedir+'/'+base,mod.data[0])
-            elif mod.mode == 'xml':
-                xml_merge(scopedir+'/'+base,mod.data[0])
-            elif mod.mode == 'sjson':
-                sjson_merge(scopedir+'/'+base,mod.data[0])
+        # the same base and mods were merged before, here or wherever the
+        # output cache was filled
+        cached = key is not None and do_output_cache and output_fetch(key,work)
+        if echo:
+            i=0
+            alt_print("\n"+base+" ["+strategy+"]"+" (cached output)"*cached)
+        start = time.perf_counter()
+        read = os.path.getsize(source) if run_profile is not None else 0
+
+        # consecutive mods of the same mode are merged as one chain, so the
+        # target is only read and written once per chain
+        chain = []
+        data = None
+        for j,mod in enumerate(mods):
+            if mod.mode in merges and not cached:
+                chain.append(mod)
+                if j+1 == len(mods) or mods[j+1].mode != mod.mode:
+                    t = time.perf_counter()
+                    data = merges[mod.mode](source,*(m.deployed()[0] for m in chain),
+                                            out=work)
+                    source = work
+                    if run_profile is not None:
+                        # a chain is merged in one go, so its time is
+                        # shared out evenly between its mods
+                        t = (time.perf_counter()-t)/len(chain)
+                        for m in chain:
+                            size = os.path.getsize(m.deployed()[0])
+                            profile_add('mods',' + '.join(m.sources()),t,
+                                        bytes=size)
+                            read += size
+                    chain = []
             if echo:
                 k = i+1
-                for s in mod.src.split('\n'):
+                for s in mod.sources():
                     i+=1
                     alt_print(" #"+str(i)+" +"*(k<i)+" "*((k>=i)+5-len(str(i)))+s)
+        if source != work and not cached:
+            lazy_import('shutil').copyfile(source,work)
+        if key is not None and do_output_cache and not cached:
+            output_store(key,work)
+        # lua chains hand back what they wrote, so it doesn't need reading again
+        if isinstance(data,bytes):
+            digest = hashdata(data)
+        else:
+            digest = hashfile(work)
+        done = True
     except Exception as e:
-        copyfile(basedir+"/"+base,scopedir+'/'+base)
         raise RuntimeError("Encountered uncaught exception while implementing mod changes") from e
-    
-    Path(editdir+"/"+"/".join(base.split("/")[:-1])).mkdir(parents=True, exist_ok=True)
-    hashfile(scopedir+'/'+base,editdir+'/'+base+edited_suffix)
-
-def cleanup(folder=None,echo=True):
-    if not os.path.exists(folder):
-        return True
-    if os.path.isdir(folder):
-        empty = True
-        for content in os.scandir(folder):
-            if cleanup(content,echo):
-                empty = False
-        if empty:
-            os.rmdir(folder)
-            return False
-        return True
-    if isinstance(folder,str):
-        return None
-    folderpath = folder.path.replace("\\","/")
-    path = folderpath[len(basedir)+1:]
-    if os.path.isfile(scopedir+'/'+path):
-        if is_edited(path):
-            copyfile(folderpath,scopedir+'/'+path)
-        if echo:
-            alt_print(path)
-        os.remove(folderpath)
-        return False
-    return True
-
-def restorebase(echo=True):
-    if not cleanup(basedir,echo):
+    finally:
+        # the game folder is never left with a temp file, even when the
+        # run is interrupted
+        if not done and os.path.exists(work):
+            os.remove(work)
+    if run_profile is not None:
+        profile_add('targets',base,time.perf_counter()-start,
+                    read=read,written=os.path.getsize(work))
+    return work, digest
+
+def discard_edits(staged):
+    for work,digest in staged.values():
+        if os.path.exists(work):
+            os.remove(work)
+
+def commit_edits(staged):
+    # every temp file is on disk before the first live file is swapped,
+    # so a crash never leaves a target half written
+    if not staged:
+        return
+    for work,digest in staged.values():
+        fd = os.open(work,os.O_RDWR)
         try:
-            copy_tree(basedir,scopedir)
-        except DistutilsFileError:
-            pass    
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    # and so are the digests about to be recorded, so a crash between
+    # swapping a file and recording it still leaves it known as edited
+    with open(editdir+'/'+journal_name,'w') as f:
+        json.dump({base:digest for base,(work,digest) in staged.items()},f)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        for base,(work,digest) in staged.items():
+            os.replace(work,scopedir+'/'+base)
+            os.makedirs(editdir+"/"+"/".join(base.split("/")[:-1]), exist_ok=True)
+            with open(editdir+'/'+base+edited_suffix,'w') as f:
+                f.write(digest)
+    except BaseException:
+        discard_edits(staged)
+        raise
+    os.remove(editdir+'/'+journal_name)
+
+## Parallel merging
+
+worker_globals = ('scopedir','basedir','editdir','modsdir','deploydir',
+                  'deploy_from_scope','logsdir','hashes',
+                  'parsecachedir','do_parse_cache','hash_mmap',
+                  'copy_strategies','run_profile',
+                  'outputcachedir','do_output_cache','path_table')
+
+def worker_setup(state):
+    globals().update(state)
+    global do_echo, do_log, do_input
+    do_echo = do_log = do_input = False
+
+def make_base_edits_job(base,mods,key):
+    global echo_buffer, run_profile
+    echo_buffer = io.StringIO()
+    if run_profile is not None:
+        run_profile = profile_new()
+    try:
+        staged = make_base_edits(base,mods,key=key)
+        return echo_buffer.getvalue(), staged, run_profile
+    finally:
+        echo_buffer = None
+
+def make_base_edits_parallel(todo,jobs,keys={}):
+    # targets are independent, so each one is merged in its own process
+    # and its output is replayed in order once it is done
+    state = {k:globals()[k] for k in worker_globals}
+    executor = lazy_import('futures').ProcessPoolExecutor
+    futures = {}
+    staged = {}
+    error = None
+    try:
+        with executor(jobs,initializer=worker_setup,initargs=(state,)) as pool:
+            futures = {base:pool.submit(make_base_edits_job,base,mods,keys.get(base))
+                       for base,mods in todo.items()}
+            for base,future in futures.items():
+                try:
+                    text, staged[base], profile = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                alt_print(text,end='')
+                if profile is not None:
+                    profile_merge(profile)
+    except BaseException:
+        # interrupted, what the workers finished is thrown away as well
+        for base,future in futures.items():
+            if future.done() and not future.cancelled() \
+               and future.exception() is None:
+                staged.setdefault(base,future.result()[1])
+        discard_edits(staged)
+        raise
+    if error is not None:
+        discard_edits(staged)
+        raise error
+    return staged
+
+## Watching
+
+class poll_Watcher():
+    """ changed files under some folders, found by comparing their stats """
+
+    def __init__(self,interval):
+        self.interval = interval
+        self.folders = {}
+        self.state = {}
+
+    def scan(self,folder,recursive):
+        if not os.path.isdir(folder):
+            return {}
+        if recursive:
+            return {path:entry[1:3] for path,entry in index_folder(folder).items()
+                    if not entry[0]}
+        state = {}
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if not entry.is_dir():
+                        st = entry.stat()
+                        state[folder+'/'+entry.name] = (st.st_size,st.st_mtime_ns)
+                except OSError:
+                    pass
+        return state
+
+    def watch(self,folder,recursive=True):
+        if folder not in self.folders:
+            self.folders[folder] = recursive
+            self.state.update(self.scan(folder,recursive))
+
+    def changes(self,timeout=None):
+        end = None if timeout is None else time.monotonic()+timeout
+        while True:
+            state = {}
+            for folder,recursive in self.folders.items():
+                state.update(self.scan(folder,recursive))
+            changed = {path for path in state.keys() | self.state.keys()
+                       if state.get(path) != self.state.get(path)}
+            self.state = state
+            wait = self.interval if end is None else min(self.interval,end-time.monotonic())
+            if changed or wait <= 0:
+                return changed
+            time.sleep(wait)
+
+    def close(self):
+        self.folders.clear()
+
+class inotify_Watcher():
+    """ changed files under some folders, as reported by inotify (linux) """
+
+    # modify, close_write, moved_from, moved_to, create, delete,
+    # delete_self, move_self; not attrib, deploying by hard link would
+    # report every deployed mod file
+    mask = 0x2|0x8|0x40|0x80|0x100|0x200|0x400|0x800
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+
+    def __init__(self):
+        ctypes = lazy_import('ctypes')
+        self.libc = ctypes.CDLL(None,use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno,os.strerror(errno))
+        self.wds = {}
+        self.folders = {}
+
+    def watch(self,folder,recursive=True):
+        if folder in self.folders or not os.path.isdir(folder):
+            return
+        wd = self.libc.inotify_add_watch(self.fd,os.fsencode(folder),self.mask)
+        if wd < 0:
+            errno = lazy_import('ctypes').get_errno()
+            raise OSError(errno,os.strerror(errno),folder)
+        self.wds[wd] = (folder,recursive)
+        self.folders[folder] = wd
+        if recursive:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        self.watch(folder+'/'+entry.name)
+
+    def changes(self,timeout=None):
+        changed = set()
+        ready,_,_ = lazy_import('select').select([self.fd],[],[],timeout)
+        if not ready:
+            return changed
+        data = os.read(self.fd,2**16)
+        struct = lazy_import('struct')
+        i = 0
+        while i < len(data):
+            wd,mask,_,n = struct.unpack_from('iIII',data,i)
+            name = os.fsdecode(data[i+16:i+16+n].rstrip(b'\0'))
+            i += 16+n
+            if mask & self.IN_Q_OVERFLOW:
+                # events were lost, so anything may have changed
+                changed.update(self.folders)
+                continue
+            if wd not in self.wds:
+                continue
+            folder,recursive = self.wds[wd]
+            if mask & self.IN_IGNORED:
+                del self.wds[wd]
+                self.folders.pop(folder,None)
+                continue
+            path = folder+'/'+name if name else folder
+            changed.add(path)
+            if recursive and mask & self.IN_ISDIR and mask & (0x80|0x100):
+                # files may have arrived before the new folder was watched
+                self.watch(path)
+                for root,dirs,files in os.walk(path):
+                    changed.update(root.replace("\\","/")+'/'+f for f in files)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def new_watcher():
+    # inotify where there is one, polling anywhere else or when an
+    # interval is configured
+    if watch_interval is None and sys.platform.startswith('linux'):
+        try:
+            return inotify_Watcher()
+        except (OSError,AttributeError):
+            pass
+    return poll_Watcher((watch_interval or 250)/1000)
 
 # Global Preprocessing
 
 def thetime():
-    return datetime.now().strftime("%d.%m.%Y-%I.%M%p-%S.%f")
+    return lazy_import('datetime').datetime.now().strftime("%d.%m.%Y-%I.%M%p-%S.%f")
 
 def preplogfile():
-    if do_log:
-        Path(logsdir).mkdir(parents=True, exist_ok=True)
-        logging.basicConfig(filename= \
-                            logsdir+"/"+logfile_prefix+thetime()+logfile_suffix,
-                            level = logging.INFO)
+    global log_listener
+    logging = lazy_import('logging')
+    if do_log and log_listener is None:
+        import logging.handlers
+        os.makedirs(logsdir, exist_ok=True)
+        # records are handed to a background thread, which writes them to
+        # the log file in batches
+        handler = logging.FileHandler(logsdir+"/"+logfile_prefix+thetime()
+                                      +logfile_suffix)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        handler = logging.handlers.MemoryHandler(log_batch,logging.ERROR,handler)
+        records = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel(logging.INFO)
+        log_listener = logging.handlers.QueueListener(records,handler)
+        log_listener.start()
+        atexit.register(stoplogfile)
     logging.captureWarnings(do_log and not do_echo)
 
+def stoplogfile():
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            target = handler.target
+            handler.close()
+            target.close()
+        log_listener = None
+
 def update_scope(rel='..'):
     global gamedir
     gamedir = os.path.join(os.path.realpath(rel), '').replace("\\","/")[:-1]
@@ -767,7 +1856,7 @@ def configure_globals(condict={},flow=True):
 
     global do_echo,do_log,do_input
     do_echo = safeget(condict,'echo',do_echo)
-    do_log = safeget(condict,'log',do_log)
+    do_log = safeget(condict,'log',do_log) and not cfg_plan
     do_input = safeget(condict,'input',do_input)
 
     global logsrel,logfile_prefix,logfile_suffix
@@ -779,8 +1868,42 @@ def configure_globals(condict={},flow=True):
     logsdir = os.path.join(os.path.realpath(logsrel), '').replace("\\","/")
     preplogfile()
 
-    global hashes
+    global copy_strategies
+    copy_strategies = safeget(condict,'copy_strategies',copy_strategies)
+
+    global hashes, hash_mmap
     hashes = safeget(condict,'hashes',hashes)
+    missing = [mode for mode in hashes if not hash_available(mode)]
+    if missing:
+        hashes = [mode for mode in hashes if mode not in missing] or ['md5']
+        alt_warn(MSG_MissingHashes.format(' '.join(missing),' '.join(hashes),configfile))
+    hash_mmap = safeget(condict,'hash_mmap',hash_mmap)
+
+    global do_incremental
+    do_incremental = safeget(condict,'incremental',do_incremental)
+
+    global do_parse_cache, parse_cache_size
+    do_parse_cache = safeget(condict,'parse_cache',do_parse_cache)
+    parse_cache_size = safeget(condict,'parse_cache_size',parse_cache_size)
+
+    global do_output_cache, output_cache_size
+    do_output_cache = safeget(condict,'output_cache',do_output_cache)
+    output_cache_size = safeget(condict,'output_cache_size',output_cache_size)
+
+    global watch_debounce, watch_interval
+    watch_debounce = safeget(condict,'watch_debounce',watch_debounce)
+    watch_interval = safeget(condict,'watch_interval',watch_interval)
+
+    global do_profile_run, profile_dump, profile_json
+    profile_dump = safeget(condict,'profile_dump',profile_dump)
+    profile_json = safeget(condict,'profile_json',profile_json)
+    do_profile_run = safeget(condict,'profile_run',do_profile_run) \
+                     or bool(profile_dump or profile_json)
+
+    global jobs
+    jobs = safeget(condict,'jobs',jobs)
+    if not jobs or jobs < 0:
+        jobs = os.cpu_count() or 1
 
     global  thisfile, localdir, localparent            
     thisfile = os.path.realpath(__file__).replace("\\","/")
@@ -832,6 +1955,18 @@ def configure_globals(condict={},flow=True):
         editdir = os.path.join( \
             os.path.realpath(editdir) \
             , '').replace("\\","/")[:-1]
+
+    global parsecachedir, fingerprint_index
+    parsecachedir = editdir+'/'+parsecache_folder
+    fingerprint_index = None
+
+    global outputcachedir
+    outputcachedir = safeget(condict,'output_cache_dir',None)
+    if outputcachedir is None:
+        outputcachedir = editdir+'/'+outputcache_folder
+    elif not os.path.isabs(outputcachedir):
+        outputcachedir = os.path.realpath(scopedir+'/'+outputcachedir)
+    outputcachedir = outputcachedir.replace("\\","/")
     
     global modsdir
     modsdir = (scopedir+'/'+modsrel).replace("\\","/")
@@ -851,6 +1986,8 @@ def configure_globals(condict={},flow=True):
            mods_in_scope, deploy_in_scope, game_has_scope
     local_in_scope = base_in_scope = edit_in_scope \
                      = mods_in_scope = deploy_in_scope = None
+    path_cache.clear()
+    scope_cache.clear()
 
     game_has_scope = in_scope(scopedir).message == "DirInScope"
     local_in_scope = in_scope(thisfile).message == "FileInScope"
@@ -874,7 +2011,11 @@ def configure_globals(condict={},flow=True):
     deploy_from_scope = deploydir[len(os.path.commonprefix([scopedir,deploydir]))+1:]
 
 def configsetup(predict={},postdict={}):
+    # the profile tables are completed here rather than on import
+    for k,v in default_profiles.items():
+        default_profiles[k]=dictmap(profile_template.copy(),v)
     condict = YML_framework
+    yaml = lazy_import('yaml')
     if yaml is not None and not cfg_overwrite:
         try:
             with open(configfile) as f:
@@ -886,7 +2027,7 @@ def configsetup(predict={},postdict={}):
     if cfg_modify:
         dictmap(condict,postdict)
 
-    if yaml is not None:
+    if yaml is not None and not cfg_plan:
         with open(configfile, 'w') as f:
             yaml.dump(condict, f)
 
@@ -931,6 +2072,12 @@ This means deploying mods is impossible!
 Configure the deployment path 'folder_deployed' to be within the content.
 """+MSG_ConfigHelp.format('{2}')
 
+MSG_MissingHashes = """
+The hashes '{0}' are not available, files are compared with '{1}' instead.
+Hashes starting with xxh need the xxhash module (pip install xxhash).
+Configure 'hashes' in '{2}' or use the terminal option --hashes.
+"""
+
 MSG_CommandLineHelp = """
     -h --help
         print this help text
@@ -949,7 +2096,28 @@ MSG_CommandLineHelp = """
     -c --config <relative file path>
         choose config file
     -H --hashes <space separated hash names>
-        hashes used to compare files in edit cache (ie, "md5 sha1")
+        hashes used to compare files in edit cache (ie, "md5 sha1",
+        "blake2b", or "xxh3_64" with the xxhash module)
+    -I --incremental
+        only rebuild files whose base or mods changed since the last run
+    -j --jobs <number of processes>
+        merge files in parallel (0 uses every core)
+    --no-parse-cache
+        parse every sjson file again instead of using the parse cache
+    --no-output-cache
+        merge every file again instead of using earlier merged outputs
+    --plan
+        report what a run would rebuild, deploy and restore, without
+        writing anything (not even the config)
+    -w --watch
+        keep running, and import again whenever the mods (or the game's
+        copy of a target) change, redoing only the affected targets
+    --profile-run
+        time every phase, target and mod, and print a report at the end
+    --profile-dump <file path>
+        also write cProfile stats of the run (implies --profile-run)
+    --profile-json <file path>
+        also write the report as JSON (implies --profile-run)
     -g --game <relative folder path>
         temporarily use a different game directory
     -p --profile <profile name>
@@ -1005,14 +2173,25 @@ default_profiles = {
         },
 }
 
-for k,v in default_profiles.items():
-    default_profiles[k]=dictmap(profile_template.copy(),v)
-
 YML_framework = {
     'echo':True,
     'input':True,
     'log':True,
     'hashes':hashes,
+    'hash_mmap':True,
+    'copy_strategies':copy_strategies,
+    'incremental':False,
+    'jobs':1,
+    'parse_cache':True,
+    'parse_cache_size':256,
+    'output_cache':True,
+    'output_cache_dir':None,
+    'output_cache_size':1024,
+    'watch_debounce':50,
+    'watch_interval':None,
+    'profile_run':False,
+    'profile_dump':None,
+    'profile_json':None,
     'profile':None,
     'profile_special':profile_template,
     'profiles':default_profiles,
@@ -1025,41 +2204,121 @@ YML_framework = {
 
 def start(*args,**kwargs):
 
+    t = time.perf_counter()
     configsetup(kwargs.get('predict',{}),kwargs.get('postdict',{}))
-        
+
+    global run_profile
+    run_profile = None
+    if cfg_plan:
+        return plan_mods()
+    if cfg_watch:
+        return watch_mods()
+    if not do_profile_run:
+        return import_mods()
+    run_profile = profile_new()
+    profile_add('phases','config',time.perf_counter()-t)
+    profiler = None
+    if profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        import_mods()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_dump)
+        profile_report()
+
+def import_mods():
+
+    t = time.perf_counter()
     global codes
     codes = defaultdict(list)
     global todeploy
     todeploy = {}
-
-    # remove anything in the base cache that is not in the edit cache
-    alt_print("Cleaning edits... (if there are issues validate/reinstall files)")
-    restorebase()
-
-    # remove the edit cache and base cache from the last run
-    def onerror(func, path, exc_info):
-        if not os.access(path, os.W_OK):
-            os.chmod(path, stat.S_IWUSR)
-            func(path)
-        else:
-            raise
-    rmtree(editdir, onerror)
-    Path(editdir).mkdir(parents=True, exist_ok=True)
-    rmtree(basedir, onerror)
-    Path(basedir).mkdir(parents=True, exist_ok=True)
-    Path(modsdir).mkdir(parents=True, exist_ok=True)
-    Path(deploydir).mkdir(parents=True, exist_ok=True)
+    path_table.clear()
+    path_ids.clear()
+
+    # an incremental run needs the manifest of the last run to compare against
+    manifest = None
+    if do_incremental:
+        manifest = load_manifest()
+
+    full = manifest is None
+    if full:
+        manifest = {}
+    os.makedirs(editdir, exist_ok=True)
+    os.makedirs(basedir, exist_ok=True)
+    os.makedirs(modsdir, exist_ok=True)
+    os.makedirs(deploydir, exist_ok=True)
+    recover_edits()
     
+    # the mods folder is walked once, everything after is answered from
+    # the index
+    global mod_index
+    mod_index = None
+    mod_index = index_folder(modsdir)
+    profile_add('phases','discovery',time.perf_counter()-t)
+
+    t = time.perf_counter()
     alt_print("\nReading mod files...")
-    for mod in os.scandir(modsdir):
-        modfile_load(mod.path.replace("\\","/")+"/"+modfile)
+    for mod in index_children(modsdir):
+        modfile_load(mod+"/"+modfile)
+    profile_add('phases','modfiles',time.perf_counter()-t)
 
-    deploy_mods()
+    t = time.perf_counter()
+    deployed = deploy_mods()
+    profile_add('phases','deploy',time.perf_counter()-t)
     
+    t = time.perf_counter()
     alt_print("\nModified files for "+folderprofile+" mods:")
+    fingerprints = {}
+    todo = {}
     for base, mods in codes.items():
         sort_mods(base,mods)
-        make_base_edits(base,mods)
+        fingerprints[base] = target_fingerprint(base,mods)
+        if manifest.get(base) == fingerprints[base] and is_edited(base):
+            alt_print("\n"+base+" (unchanged)")
+            continue
+        todo[base] = mods
+    profile_add('phases','fingerprints',time.perf_counter()-t)
+
+    # nothing in the scope folder changes until every target has been
+    # rendered, a failed run leaves it as it was
+    t = time.perf_counter()
+    keys = {base:output_key(fingerprints[base]) for base in todo}
+    if jobs > 1 and len(todo) > 1:
+        staged = make_base_edits_parallel(todo,min(jobs,len(todo)),keys)
+    else:
+        staged = {}
+        try:
+            for base, mods in todo.items():
+                staged[base] = make_base_edits(base,mods,key=keys[base])
+        except:
+            discard_edits(staged)
+            raise
+    profile_add('phases','merge',time.perf_counter()-t)
+    t = time.perf_counter()
+    commit_edits(staged)
+    profile_add('phases','commit',time.perf_counter()-t)
+
+    t = time.perf_counter()
+    # restore files edited before that no mod targets anymore
+    stale = sorted(base for base in (cached_targets() if full else manifest)
+                   if base not in codes)
+    if stale:
+        alt_print("\nCleaning edits... (if there are issues validate/reinstall files)")
+        for base in stale:
+            restore_target(base)
+        prune_dirs(basedir)
+        prune_dirs(editdir)
+    deploy_prune(*deployed)
+    save_manifest(fingerprints)
+    fingerprints_save()
+    parsecache_evict()
+    outputcache_evict()
+    profile_add('phases','cleanup',time.perf_counter()-t)
 
     bs = len(codes)
     ms = sum(map(len,codes.values()))
@@ -1067,6 +2326,158 @@ def start(*args,**kwargs):
     alt_print("\n"+str(bs)+" file"+("s are"," is")[bs==1]+" modified by"
               +" a total of "+str(ms)+" mod file"+"s"*(ms!=1)+".")
 
+def watch_changes(watcher,targets,changed=None):
+    # changes in the mods folder, and changes to targets made by someone
+    # else, like a game update
+    if not changed:
+        changed = watcher.changes(None)
+    while True:
+        more = watcher.changes(watch_debounce/1000)
+        if not more:
+            break
+        changed |= more
+    return {path for path in changed
+            if is_under(path_parts(path),modsdir) or path in targets}
+
+def watch_mods():
+    global parse_memo, parse_memo_last, do_incremental
+    parse_memo = {}
+    parse_memo_last = {}
+    import_mods()
+    do_incremental = True
+    watcher = None
+    try:
+        watcher = new_watcher()
+        try:
+            watcher.watch(modsdir)
+        except OSError as e:
+            # likely out of inotify watches
+            alt_warn("Falling back to polling: "+repr(e))
+            watcher.close()
+            watcher = poll_Watcher((watch_interval or 250)/1000)
+            watcher.watch(modsdir)
+        pending = None
+        alt_print("\nWatching for changes... (Ctrl+C to stop)")
+        while True:
+            targets = {scopedir+'/'+base for base in codes}
+            for folder in sorted({path.rsplit('/',1)[0] for path in targets}):
+                try:
+                    watcher.watch(folder,False)
+                except OSError as e:
+                    alt_warn("Not watching "+folder+": "+repr(e))
+            changed = watch_changes(watcher,targets,pending)
+            if not changed:
+                continue
+            t = time.perf_counter()
+            alt_print("\n"+str(len(changed))+" changed file"+"s"*(len(changed)!=1)+":")
+            for path in sorted(changed):
+                alt_print(path)
+            parse_memo_last, parse_memo = parse_memo, {}
+            try:
+                import_mods()
+            except Exception as e:
+                # the scope is left as it was, wait for the next change
+                alt_warn("Import failed: "+repr(e))
+            # the targets just written are our own changes, mods edited
+            # meanwhile are not
+            pending = {path for path in watcher.changes(0)
+                       if is_under(path_parts(path),modsdir)}
+            alt_print("Done in "+str(round((time.perf_counter()-t)*1000,1))+" ms.")
+            alt_print("\nWatching for changes... (Ctrl+C to stop)")
+    except KeyboardInterrupt:
+        alt_print("\nStopped watching.")
+    finally:
+        if watcher is not None:
+            watcher.close()
+        parse_memo = None
+        parse_memo_last = None
+
+def plan_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def plan_mods():
+    # goes through the mods like import_mods does and reports what it
+    # would do, nothing is written
+    global codes, todeploy, mod_index
+    codes = defaultdict(list)
+    todeploy = {}
+    path_table.clear()
+    path_ids.clear()
+    manifest = None
+    if do_incremental:
+        manifest = load_manifest()
+    full = manifest is None
+
+    mod_index = None
+    if os.path.isdir(modsdir):
+        mod_index = index_folder(modsdir)
+        for mod in index_children(modsdir):
+            modfile_load(mod+"/"+modfile,False)
+
+    alt_print("\nPlan for "+folderprofile+" mods:")
+    totals = {'rebuild':0,'unchanged':0,'read':0,'written':0,'cost':0}
+    for base, mods in codes.items():
+        sort_mods(base,mods)
+        fingerprint = target_fingerprint(base,mods)
+        unchanged = not full and is_edited(base) \
+                    and manifest.get(base) == fingerprint
+        output = not unchanged and do_output_cache \
+                 and os.path.isfile(outputcachedir+'/'+output_key(fingerprint))
+        source = target_source(base)
+        read = written = plan_size(source)
+        parsed = hits = misses = 0
+        if any(mod.mode in ('xml','sjson') for mod in mods):
+            parsed += written
+        i = 0
+        alt_print("\n"+base+(" (unchanged)" if unchanged else
+                              " (cached output)" if output else " (rebuild)"))
+        for mod in mods:
+            k = i+1
+            for src in mod.sources():
+                i+=1
+                alt_print(" #"+str(i)+" +"*(k<i)+" "*((k>=i)+5-len(str(i)))+src)
+                size = plan_size(modsdir+'/'+src)
+                read += size
+                if mod.mode == 'lua':
+                    written += len("\nImport \"../"+deploy_from_scope+'/'+src+"\"")
+                    continue
+                written += size
+                parsed += size
+                if mod.mode == 'sjson' and do_parse_cache:
+                    digest = file_digests(modsdir+'/'+src)[hashes[0]]
+                    if os.path.isfile(parsecachedir+'/'+digest+'.sjson'):
+                        hits += 1
+                        parsed -= size
+                    else:
+                        misses += 1
+        # xml and sjson sizes after merging are a guess, the cost is what
+        # gets parsed plus what gets written
+        cost = 0 if unchanged else written if output else parsed+written
+        alt_print(" read "+str(read)+" bytes, write ~"+str(written)+" bytes, "
+                  +"parse cache "+str(hits)+" hit"+"s"*(hits!=1)+" "
+                  +str(misses)+" miss"+"es"*(misses!=1)+", cost "+str(cost))
+        totals['unchanged' if unchanged else 'rebuild'] += 1
+        totals['read'] += read*(not unchanged)
+        totals['written'] += written*(not unchanged)
+        totals['cost'] += cost
+
+    todo, stale, _ = deploy_plan()
+    alt_print("\nDeploy: "+str(len(todo))+" to copy ("
+              +str(sum(job[3] for job in todo))+" bytes), "
+              +str(len(todeploy)-len(todo))+" unchanged, "
+              +str(len(stale))+" stale")
+    restore = sorted(base for base in (cached_targets() if full else manifest)
+                     if base not in codes)
+    if restore:
+        alt_print("Restore: "+", ".join(restore))
+    alt_print("\n"+str(totals['rebuild'])+" file"+"s"*(totals['rebuild']!=1)
+              +" to rebuild, "+str(totals['unchanged'])+" unchanged, reading "
+              +str(totals['read'])+" and writing ~"+str(totals['written'])
+              +" bytes, cost "+str(totals['cost'])+".")
+
 def main_action(*args,**kwargs):
     try:
         start(*args,**kwargs)
@@ -1074,7 +2485,7 @@ def main_action(*args,**kwargs):
         alt_print("There was a critical error, now attempting to display the error")
         alt_print("(if this doesn't work, try again in a terminal"
                   +" which doesn't close, or check the log files)")
-        logging.getLogger("MainExceptions").exception(e)
+        lazy_import('logging').getLogger("MainExceptions").exception(e)
         alt_input("Press any key to see the error...")
         raise RuntimeError("Encountered uncaught exception during program") from e
     alt_input("Press any key to end program...")
@@ -1083,13 +2494,17 @@ def main(*args,**kwargs):
     predict = {}
     postdict = {}
     
-    opts,_ = getopt(args,'hmsoleic:g:p:S:H:',
+    opts,_ = getopt(args,'hmsoleiIwc:g:p:S:H:j:',
                          ['config=','log_folder=','echo','input','special',
                           'log','log-prefix=','log-suffix=','profile=,help',
                           'special-set=','game=','modify','overwrite',
-                          '--hash='])
+                          'hashes=','incremental','jobs=','no-parse-cache',
+                          'no-output-cache',
+                          'profile-run','profile-dump=','profile-json=','plan',
+                          'watch'])
 
-    global cfg_modify, cfg_overwrite, profile_use_special, configfile, gamerel
+    global cfg_modify, cfg_overwrite, cfg_plan, cfg_watch, profile_use_special, \
+           configfile, gamerel
     
     for k,v in opts:
         if k in {'-h','--help'}:
@@ -1097,10 +2512,14 @@ def main(*args,**kwargs):
             return
         elif k in {'-m','--modify'}:
             cfg_modify = True
-            if yaml is None:
+            if lazy_import('yaml') is None:
                 alt_warn("PyYAML module not found! Config cannot be written.")
         elif k in {'-o','--overwrite'}:
             cfg_overwrite = True
+        elif k == '--plan':
+            cfg_plan = True
+        elif k in {'-w','--watch'}:
+            cfg_watch = True
         elif k in {'-s','--special'}:
             profile_use_special = True
         elif k in {'-l','--log'}:
@@ -1109,15 +2528,33 @@ def main(*args,**kwargs):
             postdict['echo']=False
         elif k in {'-i','--input'}:
             postdict['input']=False
+        elif k in {'-I','--incremental'}:
+            postdict['incremental']=True
+        elif k == '--no-parse-cache':
+            postdict['parse_cache']=False
+        elif k == '--no-output-cache':
+            postdict['output_cache']=False
+        elif k == '--profile-run':
+            postdict['profile_run']=True
+        elif k == '--profile-dump':
+            postdict['profile_dump']=v
+        elif k == '--profile-json':
+            postdict['profile_json']=v
+        elif k in {'-j','--jobs'}:
+            try:
+                postdict['jobs']=int(v)
+            except ValueError:
+                alt_warn("Number of jobs must be an integer! Ignored: "+v)
         elif k in {'-c','--config'}:
             configfile = v
         elif k in {'-g','--game'}:
             gamerel = v
         elif k in {'-p','--profile'}:
             postdict['profile']=v
-        elif k in {'-p','--profile'}:
+        elif k in {'-H','--hashes'}:
             postdict['hashes']=v.split(' ')
         elif k in {'-S','--special-set'}:
+            yaml = lazy_import('yaml')
             if yaml is not None:
                 predict.setdefault('profile_special',{})
                 predict['profile_special']=yaml.load(v, Loader=yaml.FullLoader)
@@ -1127,8 +2564,36 @@ def main(*args,**kwargs):
     main_action(*args,predict=predict,postdict=postdict)
 
 do_log = True
+log_batch = 256
+log_listener = None
+do_output_cache = True
+output_cache_size = 1024
+do_profile_run = False
+profile_dump = None
+profile_json = None
+profile_top = 20
+run_profile = None
+do_incremental = False
+jobs = 1
+do_parse_cache = True
+parse_cache_size = 256
+hash_mmap = True
+fingerprint_index = None
+parse_memo = None
+parse_memo_last = None
+watch_debounce = 50
+watch_interval = None
+mod_index = None
+path_cache = {}
+scope_cache = {}
+path_table = []
+path_ids = {}
+fingerprint_used = set()
+echo_buffer = None
 cfg_modify = False
 cfg_overwrite = False
+cfg_plan = False
+cfg_watch = False
 profile_use_special = False
 gamerel = '..'
 
@@ -0,0 +1,352 @@
+"""
+Benchmarks for the Mod Importer (SGGMI.py)
+
+Usage:
+    python benchmark.py hashing [options]
+    python benchmark.py import [options]
+    python benchmark.py startup [options]
+
+    -s --sizes <space separated sizes in MiB>
+        sizes of the synthetic files to hash (default "1 10 100 500")
+    -H --hashes <space separated hash names>
+        hashes to compute (default "md5")
+    -n --mods <number>
+        mods in the synthetic mods folder (default 200)
+    -t --targets <lua xml sjson>
+        number of targets of each kind in the synthetic game (default "20 20 20")
+    -k --target-size <size in KiB>
+        size of each synthetic target (default 64)
+    -j --jobs <number of processes>
+        passed on to the importer (default 1)
+    --seed <number>
+        seed for the synthetic trees (default 0)
+    --max-import-ms <milliseconds>
+        fail when importing SGGMI takes longer than this, as a guard
+        against start-up regressions
+    -r --repeat <number>
+        runs per measurement, the best one is kept (default 3)
+    -o --output <file path>
+        also write the results as JSON
+"""
+
+import os, sys, time, json
+import random
+import tempfile
+import subprocess
+import warnings
+from getopt import gnu_getopt
+
+import SGGMI
+
+# Hashing
+
+def hash_readloop(file,modes,blocksize=65536):
+    # the loop hashfile used before, one read() per block and per hash
+    digests = {}
+    for mode in modes:
+        hasher = SGGMI.new_hasher(mode)
+        with open(file,'rb') as afile:
+            buf = afile.read(blocksize)
+            while len(buf) > 0:
+                hasher.update(buf)
+                buf = afile.read(blocksize)
+        digests[mode] = hasher.hexdigest()
+    return digests
+
+def hash_stream(file,modes,mapped):
+    hashers = {mode:SGGMI.new_hasher(mode) for mode in modes}
+    with open(file,'rb') as afile:
+        SGGMI.hash_stream(afile,hashers.values(),os.fstat(afile.fileno()).st_size,
+                          mapped=mapped)
+    return {mode:hasher.hexdigest() for mode,hasher in hashers.items()}
+
+hash_methods = {
+    'readloop': hash_readloop,
+    'readinto': lambda file,modes: hash_stream(file,modes,False),
+    'mmap': lambda file,modes: hash_stream(file,modes,True),
+}
+
+def make_file(path,size):
+    block = os.urandom(2**20)
+    with open(path,'wb') as f:
+        for _ in range(size):
+            f.write(block)
+
+def bench_hashing(sizes,modes,repeat=3):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = tmp+'/synthetic.bin'
+        for size in sizes:
+            make_file(path,size)
+            expected = None
+            for name,method in hash_methods.items():
+                best = None
+                for _ in range(repeat):
+                    t = time.perf_counter()
+                    digests = method(path,modes)
+                    t = time.perf_counter() - t
+                    best = t if best is None else min(best,t)
+                if expected is None:
+                    expected = digests
+                elif digests != expected:
+                    raise RuntimeError(name+" hashed "+str(size)+" MiB differently")
+                results.append({'benchmark':'hashing','method':name,
+                                'size_mib':size,'hashes':modes,
+                                'seconds':best,'mib_per_second':size/best})
+    return results
+
+# Importing
+
+def make_tree(root,mods,targets,size,seed=0):
+    # a game folder with lua, xml and sjson targets of about size KiB each,
+    # and a mods folder whose modfiles use every command
+    rng = random.Random(seed)
+    content = root+'/Game/Content'
+    kinds = {'lua':targets[0],'xml':targets[1],'sjson':targets[2]}
+    if SGGMI.sjson is None:
+        kinds['sjson'] = 0
+    def write(path,text):
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w') as f:
+            f.write(text)
+    rows = max(size*1024//40,1)
+    for i in range(kinds['lua']):
+        write(content+'/Scripts/Target'+str(i)+'.lua',"-- target "+str(i)+"\n"
+              +"".join("Value"+str(j)+" = "+str(rng.random())+"\n"
+                       for j in range(rows)))
+    for i in range(kinds['xml']):
+        write(content+'/Game/Target'+str(i)+'.xml',
+              '<?xml version="1.0" encoding="utf-8"?>\n<Root>\n'
+              +"".join('  <Unit Name="U'+str(j)+'" HP="'+str(rng.randint(1,99))
+                       +'"/>\n' for j in range(rows))+'</Root>\n')
+    for i in range(kinds['sjson']):
+        write(content+'/Game/Target'+str(i)+'.sjson',"Units = [\n"
+              +"".join('  { Name = "U'+str(j)+'" HP = '+str(rng.randint(1,99))
+                       +' }\n' for j in range(rows))+"]\n")
+    for m in range(mods):
+        mod = content+'/Mods/Mod'+str(m)
+        lines = [":: synthetic mod "+str(m),
+                 "Load Priority "+str(rng.randint(0,200)),
+                 "-: deploy and include paths are",
+                 "   not resolved against the mod folder :-",
+                 'Deploy "asset.txt"; Include "extra.txt"']
+        if kinds['lua']:
+            lines += ['To "Scripts/Target'+str(rng.randrange(kinds['lua']))+'.lua"',
+                      'Import "init.lua"']
+            write(mod+'/init.lua','print("mod '+str(m)+'")\n')
+        if kinds['xml']:
+            lines += ['To "Game/Target'+str(rng.randrange(kinds['xml']))+'.xml"',
+                      'XML "map.xml"']
+            write(mod+'/map.xml','<Root>\n<Unit HP="'+str(m)+'"/>\n'
+                  +'<Unit Name="Mod'+str(m)+'"/>\n</Root>\n')
+        if kinds['sjson']:
+            lines += ['To "Game/Target'+str(rng.randrange(kinds['sjson']))+'.sjson"',
+                      'SJSON "map.sjson"']
+            write(mod+'/map.sjson','Units = [ { HP = '+str(m)+' } ]\n'
+                  +'Mod'+str(m)+' = { Enabled = true }\n')
+        write(mod+'/asset.txt',"asset "+str(m)+"\n")
+        write(mod+'/extra.txt',"")
+        write(mod+'/modfile.txt',"\n".join(lines)+"\n")
+    return content
+
+def peak_rss(reset=False):
+    # peak resident set size in KiB, since the last reset where the
+    # platform allows it (linux)
+    try:
+        with open('/proc/self/status') as f:
+            peak = next(int(line.split()[1]) for line in f
+                        if line.startswith('VmHWM:'))
+        if reset:
+            with open('/proc/self/clear_refs','w') as f:
+                f.write('5')
+        return peak
+    except (OSError,StopIteration):
+        pass
+    try:
+        import resource
+    except ModuleNotFoundError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak//1024 if sys.platform == 'darwin' else peak
+
+def run_import(content,incremental=False,jobs=1,modes=None):
+    # a headless run, the peak memory of each phase is taken when the
+    # importer records the phase
+    rss = {}
+    profile_add = SGGMI.profile_add
+    def record(section,name,seconds,**counts):
+        profile_add(section,name,seconds,**counts)
+        if section == 'phases':
+            rss[name] = peak_rss(True)
+    postdict = {'echo':False,'input':False,'log':False,'profile':'Hades',
+                'profile_run':True,'incremental':incremental,'jobs':jobs}
+    if modes:
+        postdict['hashes'] = modes
+    cwd = os.getcwd()
+    os.chdir(content)
+    SGGMI.profile_add = record
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            peak_rss(True)
+            SGGMI.start(postdict=postdict)
+    finally:
+        SGGMI.profile_add = profile_add
+        os.chdir(cwd)
+    return [{'phase':name,'seconds':entry['seconds'],'peak_rss_kib':rss.get(name)}
+            for name,entry in SGGMI.run_profile['phases'].items()]
+
+def touch_mod(content):
+    # changes one mod, so the incremental run has one target to redo
+    path = content+'/Mods/Mod0/map.xml'
+    if os.path.exists(path):
+        with open(path,'a') as f:
+            f.write('\n')
+
+scenarios = ('cold','warm','incremental')
+
+def bench_import(mods,targets,size,repeat=3,jobs=1,modes=None,seed=0):
+    best = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = make_tree(tmp,mods,targets,size,seed)
+            for scenario in scenarios:
+                if scenario == 'incremental':
+                    touch_mod(content)
+                phases = run_import(content,scenario=='incremental',jobs,modes)
+                total = sum(p['seconds'] for p in phases)
+                if scenario not in best or total < best[scenario][0]:
+                    best[scenario] = (total,phases)
+    results = []
+    for scenario in scenarios:
+        total,phases = best[scenario]
+        peak = [p['peak_rss_kib'] for p in phases if p['peak_rss_kib'] is not None]
+        phases.append({'phase':'total','seconds':total,
+                       'peak_rss_kib':max(peak) if peak else None})
+        for p in phases:
+            results.append(dict({'benchmark':'import','scenario':scenario,
+                                 'mods':mods,'targets':targets,
+                                 'target_size_kib':size,'jobs':jobs},**p))
+    return results
+
+# Start-up
+
+def import_times():
+    # -X importtime lists every import after the ones it triggered, so the
+    # lines right before SGGMI that are nested deeper are its imports
+    proc = subprocess.run([sys.executable,'-X','importtime','-c','import SGGMI'],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True,text=True,check=True)
+    lines = []
+    for line in proc.stderr.splitlines():
+        try:
+            _,cumulative,name = line.split(':',1)[1].split('|')
+            lines.append((int(cumulative),len(name)-len(name.lstrip()),name.strip()))
+        except ValueError:
+            pass
+    i = max(i for i,line in enumerate(lines) if line[2] == 'SGGMI')
+    times = {'SGGMI':lines[i][0]}
+    for cumulative,depth,name in reversed(lines[:i]):
+        if depth <= lines[i][1]:
+            break
+        if depth == lines[i][1]+2:
+            times[name] = cumulative
+    return times
+
+def bench_startup(repeat=3,top=10):
+    best = {}
+    for _ in range(repeat):
+        for name,us in import_times().items():
+            best[name] = min(best.get(name,us),us)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),'SGGMI.py')
+    helptime = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        subprocess.run([sys.executable,script,'-h'],stdout=subprocess.DEVNULL,check=True)
+        t = time.perf_counter() - t
+        helptime = t if helptime is None else min(helptime,t)
+    results = [{'benchmark':'startup','measure':'import SGGMI',
+                'seconds':best.pop('SGGMI')/1e6},
+               {'benchmark':'startup','measure':'SGGMI.py -h',
+                'seconds':helptime}]
+    for name,us in sorted(best.items(),key=lambda x:-x[1])[:top]:
+        results.append({'benchmark':'startup','measure':'  import '+name,
+                        'seconds':us/1e6})
+    return results
+
+# Reporting
+
+def print_results(results,columns):
+    rows = [[str(round(r[c],4) if isinstance(r[c],float) else r[c])
+             for c in columns] for r in results]
+    widths = [max(len(c),*(len(row[i]) for row in rows))
+              for i,c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c,w in zip(columns,widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v,w in zip(row,widths)))
+
+def main(*args):
+    opts,args = gnu_getopt(args,'hs:H:n:t:k:j:r:o:',
+                           ['help','sizes=','hashes=','mods=','targets=',
+                            'target-size=','jobs=','seed=','repeat=','output=',
+                            'max-import-ms='])
+    sizes = [1,10,100,500]
+    modes = None
+    mods = 200
+    targets = [20,20,20]
+    size = 64
+    jobs = 1
+    seed = 0
+    repeat = 3
+    output = None
+    limit = None
+    for k,v in opts:
+        if k in {'-h','--help'}:
+            print(__doc__)
+            return
+        elif k in {'-s','--sizes'}:
+            sizes = [int(x) for x in v.split(' ')]
+        elif k in {'-H','--hashes'}:
+            modes = v.split(' ')
+        elif k in {'-n','--mods'}:
+            mods = int(v)
+        elif k in {'-t','--targets'}:
+            targets = [int(x) for x in v.split(' ')]
+        elif k in {'-k','--target-size'}:
+            size = int(v)
+        elif k in {'-j','--jobs'}:
+            jobs = int(v)
+        elif k == '--seed':
+            seed = int(v)
+        elif k in {'-r','--repeat'}:
+            repeat = int(v)
+        elif k in {'-o','--output'}:
+            output = v
+        elif k == '--max-import-ms':
+            limit = float(v)
+
+    if args[:1] == ['hashing']:
+        results = bench_hashing(sizes,modes or ['md5'],repeat)
+        print_results(results,['method','size_mib','seconds','mib_per_second'])
+    elif args[:1] == ['import']:
+        results = bench_import(mods,targets,size,repeat,jobs,modes,seed)
+        print_results(results,['scenario','phase','seconds','peak_rss_kib'])
+    elif args[:1] == ['startup']:
+        results = bench_startup(repeat)
+        print_results(results,['measure','seconds'])
+    else:
+        print(__doc__)
+        return
+
+    if output:
+        with open(output,'w') as f:
+            json.dump(results,f,indent=1)
+
+    if limit is not None and args[:1] == ['startup'] \
+       and results[0]['seconds']*1000 > limit:
+        print("import SGGMI took "+str(round(results[0]['seconds']*1000,1))
+              +" ms, more than "+str(limit)+" ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,268 @@
+"""
+sjson_map against the original merge algorithm, with its crashes fixed
+
+    python -m unittest discover tests
+"""
+
+import os, sys
+import copy
+import random
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import SGGMI
+from SGGMI import DNE
+
+directives = (SGGMI.sjson_RESERVED_append,SGGMI.sjson_RESERVED_replace,
+              SGGMI.sjson_RESERVED_delete)
+
+def reference_safeget(data,key):
+    if isinstance(data,list):
+        if isinstance(key,int) and 0 <= key < len(data):
+            return data[key]
+        return DNE
+    if isinstance(data,OrderedDict):
+        return data.get(key,DNE)
+    return DNE
+
+def reference_clearDNE(data):
+    # the original clean up pass, iterating over a copy of the items
+    if isinstance(data,OrderedDict):
+        for k,v in list(data.items()):
+            if v is DNE:
+                del data[k]
+                continue
+            data[k] = reference_clearDNE(v)
+    if isinstance(data,list):
+        data = [reference_clearDNE(v) for v in data if v is not DNE]
+    return data
+
+def reference_map(indata,mapdata):
+    # the original sjson_map, with list.expand fixed to list.extend,
+    # negative _sequence keys skipped and scalars handed back before they
+    # reach the OrderedDict branch
+    if mapdata is DNE:
+        return indata
+    if reference_safeget(mapdata,"_sequence"):
+        S = []
+        for k,v in mapdata.items():
+            try:
+                if int(k) < 0:
+                    continue
+                d = int(k)-len(S)
+                if d >= 0:
+                    S.extend([DNE]*(d+1))
+                S[int(k)] = v
+            except ValueError:
+                continue
+        mapdata = S
+    if not isinstance(mapdata,(list,OrderedDict)):
+        return mapdata
+    if type(indata) == type(mapdata):
+        if reference_safeget(mapdata,0) != "_append" or isinstance(mapdata,OrderedDict):
+            if isinstance(mapdata,list):
+                if reference_safeget(mapdata,0) == "_delete":
+                    return DNE
+                if reference_safeget(mapdata,0) == "_replace":
+                    del mapdata[0]
+                    return mapdata
+                indata.extend([DNE]*(len(mapdata)-len(indata)))
+                for k,v in enumerate(mapdata):
+                    indata[k] = reference_map(reference_safeget(indata,k),v)
+            else:
+                if reference_safeget(mapdata,"_delete"):
+                    return DNE
+                if reference_safeget(mapdata,"_replace"):
+                    del mapdata["_replace"]
+                    return mapdata
+                for k,v in mapdata.items():
+                    indata[k] = reference_map(reference_safeget(indata,k),v)
+            return indata
+        elif isinstance(mapdata,list):
+            for i in range(1,len(mapdata)):
+                indata.append(mapdata[i])
+            return indata
+    else:
+        return mapdata
+    return mapdata
+
+def reference(indata,mapdata):
+    return reference_clearDNE(reference_map(copy.deepcopy(indata),copy.deepcopy(mapdata)))
+
+def merged(indata,mapdata):
+    return SGGMI.sjson_map(copy.deepcopy(indata),copy.deepcopy(mapdata))
+
+def has_directives(data):
+    if isinstance(data,list):
+        return data[:1] in ([d] for d in directives) \
+               or any(has_directives(v) for v in data)
+    if isinstance(data,OrderedDict):
+        return any(k.startswith("_") for k in data) \
+               or any(has_directives(v) for v in data.values())
+    return False
+
+def sequence_list(mapdata):
+    S = []
+    for k,v in mapdata.items():
+        if k.isdigit():
+            S.extend([DNE]*(int(k)+1-len(S)))
+            S[int(k)] = v
+    return S
+
+def passes_through(indata,mapdata):
+    # where the original meets a type mismatch, or a _replace or _append,
+    # it hands the map on as it is, directives and all, while sjson_map
+    # still applies them, so those parts can't be compared
+    if mapdata is DNE:
+        return False
+    if isinstance(mapdata,OrderedDict) and mapdata.get("_sequence"):
+        return passes_through(indata,sequence_list(mapdata))
+    if type(indata) != type(mapdata):
+        return has_directives(mapdata)
+    if isinstance(mapdata,list):
+        if mapdata[:1] in (["_append"],["_replace"]):
+            return has_directives(mapdata[1:])
+        return any(passes_through(reference_safeget(indata,k),v)
+                   for k,v in enumerate(mapdata))
+    if isinstance(mapdata,OrderedDict):
+        if mapdata.get("_replace"):
+            return has_directives(OrderedDict((k,v) for k,v in mapdata.items()
+                                              if k != "_replace"))
+        return any(passes_through(reference_safeget(indata,k),v)
+                   for k,v in mapdata.items())
+    return False
+
+def random_data(rnd,depth,directed):
+    r = rnd.random()
+    if depth > 3 or r < 0.35:
+        return rnd.choice([1,2,"a",True])
+    if r < 0.65:
+        L = [random_data(rnd,depth+1,directed) for _ in range(rnd.randint(0,4))]
+        if directed and depth > 0 and rnd.random() < 0.3:
+            L.insert(0,rnd.choice(directives))
+        return L
+    D = OrderedDict((rnd.choice("ABCDE"),random_data(rnd,depth+1,directed))
+                    for _ in range(rnd.randint(0,4)))
+    if directed and depth > 0:
+        x = rnd.random()
+        if x < 0.1:
+            D["_delete"] = True
+        elif x < 0.2:
+            D["_replace"] = True
+        elif x < 0.3:
+            D = OrderedDict((str(rnd.randint(0,5)),random_data(rnd,depth+1,directed))
+                            for _ in range(rnd.randint(1,3)))
+            D["_sequence"] = True
+    return D
+
+def random_pairs(n,seed):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        indata = OrderedDict((k,random_data(rnd,1,False)) for k in "ABCD")
+        mapdata = OrderedDict((rnd.choice("ABCDE"),random_data(rnd,1,True))
+                              for _ in range(3))
+        yield indata,mapdata
+
+def od(*items):
+    return OrderedDict(items)
+
+class SJSONMapTest(unittest.TestCase):
+
+    def assertLikeReference(self,indata,mapdata):
+        self.assertFalse(passes_through(indata,mapdata))
+        self.assertEqual(merged(indata,mapdata),reference(indata,mapdata))
+
+    def test_sequence(self):
+        self.assertLikeReference(od(('L',[1,2,3])),
+                                 od(('L',od(('_sequence',True),('1',9),('4',7)))))
+        self.assertLikeReference(od(('L',[od(('A',1)),od(('B',2))])),
+                                 od(('L',od(('_sequence',True),('1',od(('C',3)))))))
+        self.assertEqual(merged(od(('L',[1,2,3])),
+                                od(('L',od(('_sequence',True),('1',9),('4',7))))),
+                         od(('L',[1,9,3,7])))
+
+    def test_sequence_negative(self):
+        # negative keys are skipped, they used to raise IndexError or
+        # overwrite entries counted from the end
+        self.assertLikeReference(od(('L',[1,2,3])),
+                                 od(('L',od(('_sequence',True),('-1',5)))))
+        self.assertLikeReference(od(('L',[1,2,3])),
+                                 od(('L',od(('_sequence',True),('0',8),('-1',5),('2',9)))))
+        self.assertEqual(merged(od(('L',[1,2,3])),
+                                od(('L',od(('_sequence',True),('0',8),('-1',5),('2',9))))),
+                         od(('L',[8,2,9])))
+        self.assertEqual(merged(od(('L',[1])),od(('L',od(('_sequence',True),('-3',5))))),
+                         od(('L',[1])))
+
+    def test_append(self):
+        self.assertLikeReference(od(('L',[1,2])),od(('L',["_append",3,4])))
+        self.assertLikeReference(od(('L',[])),od(('L',["_append",od(('A',1))])))
+        self.assertEqual(merged(od(('L',[1,2])),od(('L',["_append",3,4]))),
+                         od(('L',[1,2,3,4])))
+
+    def test_replace(self):
+        self.assertLikeReference(od(('L',[1,2,3])),od(('L',["_replace",5])))
+        self.assertLikeReference(od(('D',od(('A',1),('B',2)))),
+                                 od(('D',od(('_replace',True),('C',3)))))
+        self.assertEqual(merged(od(('D',od(('A',1),('B',2)))),
+                                od(('D',od(('_replace',True),('C',3))))),
+                         od(('D',od(('C',3)))))
+
+    def test_delete(self):
+        self.assertLikeReference(od(('L',[1]),('M',2)),od(('L',["_delete"])))
+        self.assertLikeReference(od(('D',od(('A',1))),('M',2)),
+                                 od(('D',od(('_delete',True)))))
+        self.assertLikeReference(od(('L',[od(('A',1)),od(('B',2))])),
+                                 od(('L',[od(('_delete',True))])))
+        self.assertEqual(merged(od(('L',[od(('A',1)),od(('B',2))])),
+                                od(('L',[od(('_delete',True))]))),
+                         od(('L',[od(('B',2))])))
+
+    def test_random(self):
+        compared = 0
+        for i,(indata,mapdata) in enumerate(random_pairs(3000,seed=5)):
+            if passes_through(indata,mapdata):
+                continue
+            compared += 1
+            with self.subTest(i=i):
+                self.assertEqual(merged(indata,mapdata),reference(indata,mapdata))
+        self.assertGreater(compared,1000)
+
+    def test_type_mismatch(self):
+        # without directives both hand the map on as it is
+        for indata,mapdata in ((1,[1,2]),([1],od(('X',1))),(od(('X',1)),5),
+                               ("a",od(('Y',[1]))),([od(('X',1))],"b")):
+            with self.subTest(indata=indata,mapdata=mapdata):
+                self.assertLikeReference(od(('K',indata)),od(('K',mapdata)))
+
+    def test_type_mismatch_directives(self):
+        # with directives sjson_map merges the map into an empty container
+        # of its own type, where the original would leave them in the output
+        rnd = random.Random(7)
+        compared = 0
+        for i in range(1000):
+            mapdata = random_data(rnd,1,True)
+            if not isinstance(mapdata,(list,OrderedDict)):
+                continue
+            # a _sequence map stands for a list
+            if isinstance(mapdata,list) or mapdata.get("_sequence"):
+                empty,other = [],od(('A',1))
+            else:
+                empty,other = OrderedDict(),[1,2]
+            indata = rnd.choice([1,"a",True,other])
+            if passes_through(empty,mapdata):
+                continue
+            compared += 1
+            with self.subTest(i=i):
+                self.assertEqual(merged(od(('K',indata)),od(('K',mapdata))),
+                                 reference(od(('K',empty)),od(('K',mapdata))))
+        self.assertGreater(compared,100)
+
+    def test_no_directives_left(self):
+        for i,(indata,mapdata) in enumerate(random_pairs(2000,seed=6)):
+            with self.subTest(i=i):
+                self.assertFalse(has_directives(merged(indata,mapdata)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Formatting parity of sjson_write with the writer it replaced
+
+    python -m unittest discover tests
+"""
+
+import os, sys
+import random
+import tempfile
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import SGGMI
+
+sjson = SGGMI.lazy_import('sjson')
+
+def legacy_sjson_write(content):
+    # the original writer, kept as it was apart from returning the text
+    if isinstance(content,OrderedDict):
+        content = sjson.dumps(content)
+    else:
+        content = ""
+    s = '{\n' + content + '}'
+
+    # Indentation styling
+    p = ''
+    S = ''
+    for c in s:
+        if c in ("{","[") and p in ("{","["):
+            S += "\n"
+        if c in ("}","]") and p in ("}","]"):
+            S += "\n"
+        S += c
+        if p in ("{","[") and c not in ("{","[","\n"):
+            S = S[:-1] + "\n" + S[-1]
+        if c in ("}","]") and p not in ("}","]","\n"):
+            S = S[:-1] + "\n" + S[-1]
+        p = c
+    s = S.replace(", ","\n").split('\n')
+    i = 0
+    L = []
+    for S in s:
+        for c in S:
+            if c in ("}","]"):
+                i = i - 1
+        L.append("  "*i+S)
+        for c in S:
+            if c in ("{","["):
+                i=i+1
+    return '\n'.join(L)
+
+def od(*items):
+    return OrderedDict(items)
+
+# documents shaped like the game's, and the edge cases of the styling:
+# empty and nested containers, and strings holding brackets and commas
+corpus = [
+    od(),
+    od(('A',1)),
+    od(('A',[]),('B',od())),
+    od(('A',[[]]),('B',[od()]),('C',od(('D',od())))),
+    od(('Units',[od(('Name',"Sword"),('Damage',10),('Tags',["a","b"])),
+                 od(('Name',"Bow"),('Damage',2.5),('Ranged',True))])),
+    od(('Text',"a, b"),('Open',"x{y"),('Close',"}]"),('Both',"q[ ]")),
+    od(('Tab',"tab\tz"),('Comma',"co,"),('Space',", "),('Empty',"")),
+    od(('Deep',[[[od(('X',[1,[2,[3]]]))]]])),
+    od(('Flags',[True,False]),('Mixed',[1,"s",od(('K',None))])),
+    od(('Weapons',[od(('Name',"W"+str(i)),('Stats',od(('HP',i),('List',list(range(i))))))
+                   for i in range(5)])),
+]
+
+def random_tree(rnd,depth=0):
+    r = rnd.random()
+    if depth > 4 or r < 0.4:
+        return rnd.choice([1,2.5,True,False,"s","a, b","x{y","}]","q[","","tab\tz","co,",", "])
+    if r < 0.7:
+        return [random_tree(rnd,depth+1) for _ in range(rnd.randint(0,4))]
+    return OrderedDict((rnd.choice(["A","B","Name","C D","x"])+str(i),random_tree(rnd,depth+1))
+                       for i in range(rnd.randint(0,4)))
+
+def random_corpus(n,seed=1):
+    rnd = random.Random(seed)
+    return [OrderedDict(("K"+str(i),random_tree(rnd)) for i in range(rnd.randint(0,5)))
+            for _ in range(n)]
+
+@unittest.skipIf(sjson is None,"the SJSON module is not installed")
+class SJSONWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name+'/out.sjson'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def written(self,content,blocksize=None):
+        if blocksize is None:
+            SGGMI.sjson_write(self.path,content)
+        else:
+            # small blocks put brackets and their neighbours in different
+            # blocks, which the formatter must not notice
+            with open(self.path,'w') as f:
+                formatter = SGGMI.sjson_Formatter(f,blocksize)
+                formatter.write('{\n')
+                sjson.dump(content,formatter)
+                formatter.write('}')
+                formatter.flush(True)
+        with open(self.path) as f:
+            return f.read()
+
+    def test_corpus(self):
+        for i,content in enumerate(corpus):
+            with self.subTest(i=i):
+                self.assertEqual(self.written(content),legacy_sjson_write(content))
+
+    def test_random_trees(self):
+        for i,content in enumerate(random_corpus(300)):
+            with self.subTest(i=i):
+                self.assertEqual(self.written(content),legacy_sjson_write(content))
+
+    def test_block_boundaries(self):
+        for i,content in enumerate(corpus+random_corpus(50,seed=2)):
+            expected = legacy_sjson_write(content)
+            for blocksize in (1,2,3,7,64):
+                with self.subTest(i=i,blocksize=blocksize):
+                    self.assertEqual(self.written(content,blocksize),expected)
+
+    def test_not_a_document(self):
+        self.assertEqual(self.written(5),legacy_sjson_write(5))
+
+if __name__ == '__main__':
+    unittest.main()
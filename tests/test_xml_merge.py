@@ -0,0 +1,180 @@
+"""
+Output parity of a chained xml_merge with merging one map at a time
+through the writer it replaced
+
+    python -m unittest discover tests
+"""
+
+import os, sys
+import random
+import tempfile
+import unittest
+import xml.etree.ElementTree as xml
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import SGGMI
+
+def legacy_xml_write(filename,content,start=None):
+    # the original writer, kept as it was
+    if not isinstance(filename,str):
+        return
+    if not isinstance(content, xml.ElementTree):
+        return
+    content.write(filename)
+
+    # Indentation styling
+    data = ""
+    if start:
+        data = start
+    with open(filename,'r') as file:
+        i = 0
+        for line in file:
+            nl = False
+            if len(line.replace('\t','').replace(' ','')) > 1:
+                q = True
+                p = ''
+                for s in line:
+                    if s == '\"':
+                        q = not q
+                    if p == '<' and q:
+                        if s == '/':
+                            i -= 1
+                            data = data[:-1]
+                        else:
+                            i += 1
+                        data+=p
+                    if s == '>' and p == '/' and q:
+                        i -= 1
+                    if p in (' ') or (s == '>' and p == '\"') and q:
+                        data += '\n' + '\t'*(i - (s == '/'))
+                    if s not in (' ','\t','<') or not q:
+                        data += s
+                    p=s
+    open(filename,"w").write(data)
+
+def legacy_xml_merge(infile,mapfile):
+    # the original merge of a single map, written and parsed back per map
+    start = ""
+    with open(infile,'r') as file:
+        for line in file:
+            if line[:5] == "<?xml" and line[-3:] == "?>\n":
+                start = line
+                break
+    indata = SGGMI.xml_read(infile)
+    if mapfile:
+        mapdata = SGGMI.xml_read(mapfile)
+    else:
+        mapdata = SGGMI.DNE
+    indata = SGGMI.xml_map(indata,mapdata)
+    legacy_xml_write(infile,indata,start)
+
+start = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+# targets indented with spaces and with tabs, and maps that change,
+# replace, delete and add elements
+corpus = [
+    (start+'<Root>\n  <Unit Name="A" HP="10"/>\n  <Unit Name="B" HP="20"/>\n'
+     +'  <Unit Name="C" HP="30">\n    <W N="1"/>\n  </Unit>\n</Root>\n',
+     ['<Root>\n<Unit HP="99"/>\n<Unit Name="D" HP="5"/>\n</Root>\n',
+      '<Root>\n<Unit/><Unit Q="1"/>\n</Root>\n',
+      '<Root>\n<Unit X="1"/>\n</Root>\n']),
+    (start+'<Root>\n\t<Unit Name="A" HP="10"/>\n\t<Unit Name="B"/>\n</Root>\n',
+     ['<Root>\n<Unit HP="1"/>\n</Root>\n',
+      '<Root>\n<Unit/>\n<Unit _delete="true"/>\n</Root>\n',
+      '<Root>\n<Unit/>\n<Unit Name="E"/>\n</Root>\n']),
+    (start+'<Root>\n    <Unit Name="A">\n        <W N="1"/>\n        <W N="2"/>\n'
+     +'    </Unit>\n    <Unit Name="B"/>\n</Root>\n',
+     ['<Root _key="Name">\n<Unit Name="B" HP="2"/>\n</Root>\n',
+      '<Root>\n<Unit _replace="true" Name="R"/>\n</Root>\n']),
+]
+
+whitespace = [None,""," ","  ","\t","\t\t"," \t ","\n","\n\n","\r\n",
+              "\n  ","\n    ","\n\t\t","\n  \n  ","\n\t  "]
+
+def random_element(rnd,depth=0):
+    # texts and tails are whitespace only, as in the game's files
+    e = xml.Element(rnd.choice(["Unit","A"]))
+    for _ in range(rnd.randint(0,2)):
+        e.set(rnd.choice(["Name","HP","X"]),rnd.choice(["1","ab","x"]))
+    e.text = rnd.choice(whitespace)
+    if depth < 3:
+        for _ in range(rnd.randint(0,3)):
+            c = random_element(rnd,depth+1)
+            c.tail = rnd.choice(whitespace)
+            e.append(c)
+        if len(e):
+            # the old writer's output does not parse back without a line
+            # break before a closing tag
+            e[-1].tail = rnd.choice([w for w in whitespace if w and "\n" in w])
+    return e
+
+def random_chains(n,seed=1):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        base = start+xml.tostring(random_element(rnd),encoding='unicode')+"\n"
+        maps = [xml.tostring(random_element(rnd),encoding='unicode')
+                for _ in range(rnd.randint(2,4))]
+        yield base,maps
+
+class XMLMergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def files(self,base,maps):
+        path = self.tmp.name+'/'
+        mapfiles = []
+        for i,data in enumerate(maps):
+            mapfiles.append(path+'map'+str(i)+'.xml')
+            with open(mapfiles[-1],'w') as f:
+                f.write(data)
+        for name in ('legacy.xml','chained.xml'):
+            with open(path+name,'w') as f:
+                f.write(base)
+        return path+'legacy.xml',path+'chained.xml',mapfiles
+
+    def merged(self,base,maps):
+        # the legacy output of each map, or None where the old writer left
+        # something it could not parse back and the rest of the chain lost
+        # the target
+        legacy,chained,mapfiles = self.files(base,maps)
+        for mapfile in mapfiles:
+            legacy_xml_merge(legacy,mapfile)
+            if SGGMI.xml_read(legacy) is SGGMI.DNE:
+                return None,None
+        SGGMI.xml_merge(chained,*mapfiles)
+        with open(legacy) as f, open(chained) as g:
+            return f.read(),g.read()
+
+    def test_corpus(self):
+        for i,(base,maps) in enumerate(corpus):
+            with self.subTest(i=i):
+                expected,result = self.merged(base,maps)
+                self.assertIsNotNone(expected)
+                self.assertEqual(result,expected)
+
+    def test_random_chains(self):
+        compared = 0
+        for i,(base,maps) in enumerate(random_chains(1500)):
+            expected,result = self.merged(base,maps)
+            if expected is None:
+                continue
+            compared += 1
+            with self.subTest(i=i):
+                self.assertEqual(result,expected)
+        self.assertGreater(compared,150)
+
+    def test_single_map(self):
+        for i,(base,maps) in enumerate(random_chains(200,seed=2)):
+            with self.subTest(i=i):
+                legacy,chained,mapfiles = self.files(base,maps[:1])
+                legacy_xml_merge(legacy,mapfiles[0])
+                SGGMI.xml_merge(chained,mapfiles[0])
+                with open(legacy) as f, open(chained) as g:
+                    self.assertEqual(g.read(),f.read())
+
+if __name__ == '__main__':
+    unittest.main()